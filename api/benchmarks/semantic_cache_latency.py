@@ -0,0 +1,72 @@
+"""
+Lookup latency of the semantic SQL cache at a given size (default 100k
+questions): embedding the question, top-k search and same_meaning checks,
+as SemanticCache.lookup does them, without the database.
+
+    cd api && DATABASE_URL=sqlite:///:memory: python benchmarks/semantic_cache_latency.py
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semantic_cache import (  # noqa: E402
+    VectorIndex,
+    embed,
+    same_meaning,
+    SEMANTIC_CACHE_TOP_K,
+)
+
+WORDS = (
+    "order customer revenue product region month year selling top count average "
+    "total store employee invoice payment last previous by per excluding"
+).split()
+
+
+def question(rng: random.Random, suffix: str = "") -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(6)) + suffix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = VectorIndex()
+    started = time.perf_counter()
+    for i in range(args.entries):
+        text = question(rng, f" {i}")
+        index.add(embed(text), {"cache_key": str(i), "question": text})
+    print(
+        f"{len(index)} entries, {index.nbytes / 2**20:.0f} MB matrix, "
+        f"built in {time.perf_counter() - started:.1f} s"
+    )
+
+    timings = []
+    for _ in range(args.lookups):
+        text = question(rng)
+        started = time.perf_counter()
+        for row, _score in index.search(embed(text), SEMANTIC_CACHE_TOP_K):
+            same_meaning(text, index.entries[row]["question"])
+        timings.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    index.evict_lru(args.entries // 10)
+    evict_ms = (time.perf_counter() - started) * 1000
+
+    p50, p99 = np.percentile(timings, [50, 99]) * 1000
+    print(f"lookup p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    print(f"evicting {args.entries // 10} entries: {evict_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+import os
+import math
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from dotenv import load_dotenv
+
+from result_reader import open_result, to_dataframe
+
+load_dotenv()  # Load from .env file
+
+logger = logging.getLogger(__name__)
+
+# Most data points inlined into a chart spec, whatever the result size
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "5000"))
+
+# Vega-Lite aggregate op -> pandas groupby aggregation
+AGGREGATES = {
+    "count": "size",
+    "valid": "count",
+    "sum": "sum",
+    "mean": "mean",
+    "average": "mean",
+    "median": "median",
+    "min": "min",
+    "max": "max",
+    "distinct": "nunique",
+    "stdev": "std",
+    "variance": "var",
+}
+
+# Marks whose points are joined in x order; these are downsampled with LTTB
+LINE_MARKS = {"line", "area", "trail"}
+
+# Spec keys that transform or compose views; these are left to Vega-Lite
+COMPOSITE_KEYS = (
+    "transform",
+    "layer",
+    "concat",
+    "hconcat",
+    "vconcat",
+    "facet",
+    "repeat",
+)
+
+# Channels that place a bin on an axis (paired with x2 / y2 for the bin end)
+POSITION_CHANNELS = {"x": "x2", "y": "y2"}
+
+# Default maxbins by channel, as in Vega-Lite
+DEFAULT_MAXBINS = {"row": 12, "column": 12, "facet": 12, "color": 6, "size": 6}
+
+
+class Unsupported(Exception):
+    """The spec uses something only Vega-Lite can evaluate."""
+
+
+def _channel_defs(encoding: dict):
+    """(channel, field definition) pairs; tooltip/detail may hold lists."""
+    for channel, definition in encoding.items():
+        for item in definition if isinstance(definition, list) else [definition]:
+            if isinstance(item, dict):
+                yield channel, item
+
+
+def _mark_type(spec: dict) -> str:
+    mark = spec.get("mark")
+    return mark.get("type") if isinstance(mark, dict) else mark
+
+
+def _read_columns(path: str, fields) -> pd.DataFrame:
+    parquet_file = open_result(path)
+    available = parquet_file.schema_arrow.names
+    columns = [name for name in dict.fromkeys(fields) if name in available]
+    return to_dataframe(parquet_file.read(columns=columns or None))
+
+
+def _as_datetime(series: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, errors="coerce")
+
+
+# --- bin and timeUnit ---
+
+
+def _bin_step(lo: float, hi: float, maxbins: int, nice: bool = True) -> float:
+    """Bin width chosen the way Vega-Lite does (powers of ten, divided by 5 or 2)."""
+    span = (hi - lo) or abs(lo) or 1.0
+    if not nice:
+        return span / maxbins
+    level = math.ceil(math.log10(maxbins))
+    step = 10 ** (round(math.log10(span)) - level)
+    while math.ceil(span / step) > maxbins:
+        step *= 10
+    for divisor in (5, 2):
+        if span / (step / divisor) <= maxbins:
+            step /= divisor
+    return step
+
+
+def _bin(series: pd.Series, params, channel: str):
+    params = params if isinstance(params, dict) else {}
+    values = pd.to_numeric(series, errors="coerce")
+    lo, hi = params.get("extent") or (values.min(), values.max())
+    if pd.isna(lo) or pd.isna(hi):
+        return values, values, None
+    step = params.get("step") or _bin_step(
+        float(lo),
+        float(hi),
+        params.get("maxbins") or DEFAULT_MAXBINS.get(channel, 10),
+        params.get("nice", True),
+    )
+    start = np.floor(float(lo) / step) * step
+    bin_start = np.floor((values - start) / step) * step + start
+    # The maximum falls in the last bin, not one past it
+    past_end = (bin_start >= float(hi)) & (bin_start > start)
+    bin_start = bin_start.where(~past_end, bin_start - step)
+    return bin_start, bin_start + step, step
+
+
+TIME_UNIT_PARTS = ("year", "quarter", "month", "date", "hours", "minutes", "seconds")
+
+
+def _time_unit(series: pd.Series, unit: str) -> pd.Series:
+    """
+    Values truncated to a Vega-Lite timeUnit. Units without "year" map onto
+    2012, as Vega-Lite does, so e.g. `month` groups every January together.
+    """
+    if isinstance(unit, dict):
+        unit = unit.get("unit", "")
+    unit = (unit or "").replace("utc", "")
+    parts = [part for part in TIME_UNIT_PARTS if part in unit]
+    remainder = unit
+    for part in parts:
+        remainder = remainder.replace(part, "")
+    if not parts or remainder:
+        # e.g. day (of week), week, dayofyear, milliseconds
+        raise Unsupported(f"timeUnit {unit!r}")
+
+    dates = _as_datetime(series)
+    if "quarter" in parts and "month" not in parts:
+        month = (dates.dt.quarter - 1) * 3 + 1
+    elif "month" in parts:
+        month = dates.dt.month
+    else:
+        month = 1
+    components = {
+        "year": dates.dt.year if "year" in parts else 2012,
+        "month": month,
+        "day": dates.dt.day if "date" in parts else 1,
+        "hour": dates.dt.hour if "hours" in parts else 0,
+        "minute": dates.dt.minute if "minutes" in parts else 0,
+        "second": dates.dt.second if "seconds" in parts else 0,
+    }
+    return pd.to_datetime(pd.DataFrame(components, index=series.index), errors="coerce")
+
+
+# --- downsampling ---
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets. `x` must
+    be sorted. The first and last points are always kept; each bucket in
+    between keeps the point forming the largest triangle with the previous
+    pick and the mean of the next bucket, which preserves peaks and dips.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(min(n, max(threshold, 0)))
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        px, py = x[previous], y[previous]
+        areas = np.abs(
+            (px - next_x) * (y[start:end] - py) - (px - x[start:end]) * (next_y - py)
+        )
+        previous = start + int(np.argmax(areas)) if len(areas) else start
+        picked[i + 1] = previous
+    return picked
+
+
+def _numeric(series: pd.Series) -> np.ndarray:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("int64").to_numpy(dtype=float)
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+
+
+def _downsample_lines(df, x_field, y_field, series_field, max_points: int):
+    """LTTB per series (color), each series getting a share of the budget."""
+    df = df.dropna(subset=[x_field, y_field])
+    groups = (
+        [group for _, group in df.groupby(series_field, sort=False, dropna=False)]
+        if series_field
+        else [df]
+    )
+    kept = []
+    for group in groups:
+        group = group.sort_values(x_field, kind="stable")
+        budget = max(3, int(max_points * len(group) / max(len(df), 1)))
+        picked = lttb(_numeric(group[x_field]), _numeric(group[y_field]), budget)
+        kept.append(group.iloc[picked])
+    return pd.concat(kept) if kept else df
+
+
+def _sample_rows(path: str, fields, total_rows: int, max_points: int, seed=0):
+    """
+    A uniform random sample of `max_points` rows, decoded from only the
+    needed columns. Row order is kept so the chart still reads naturally.
+    """
+    rng = np.random.default_rng(seed)
+    indices = np.sort(rng.choice(total_rows, size=max_points, replace=False))
+    parquet_file = open_result(path)
+    available = parquet_file.schema_arrow.names
+    columns = [name for name in dict.fromkeys(fields) if name in available]
+    table = parquet_file.read(columns=columns or None)
+    return to_dataframe(table.take(pa.array(indices)))
+
+
+# --- aggregation ---
+
+
+def _output_name(op: str, field: str) -> str:
+    return "__count" if op == "count" else f"{op}_{field}"
+
+
+def _aggregate(df: pd.DataFrame, encoding: dict, max_points: int):
+    """
+    Groups by every non-aggregated field (binned or time-truncated first) and
+    computes each aggregate, like Vega-Lite's aggregate transform. The
+    encoding is rewritten to plot the precomputed columns.
+    """
+    keys, measures = [], {}
+    columns = {}
+    new_encoding = {}
+
+    for channel, definition in encoding.items():
+        items = definition if isinstance(definition, list) else [definition]
+        rewritten = []
+        for item in items:
+            if not isinstance(item, dict):
+                rewritten.append(item)
+                continue
+            item = dict(item)
+            field, op = item.get("field"), item.get("aggregate")
+
+            if op is not None:
+                if isinstance(op, dict) or op not in AGGREGATES:
+                    raise Unsupported(f"aggregate {op!r}")
+                if field is not None and field not in df.columns:
+                    raise Unsupported(f"field {field!r}")
+                name = _output_name(op, field)
+                measures[name] = (op, field)
+                item.pop("aggregate")
+                item["field"] = name
+                item.setdefault("title", f"{op.capitalize()} of {field or 'records'}")
+                item.setdefault("type", "quantitative")
+            elif field is not None and field in df.columns:
+                if item.get("bin") and item["bin"] != "binned":
+                    start, end, step = _bin(df[field], item["bin"], channel)
+                    name = f"bin_{field}"
+                    columns[name], columns[f"{name}_end"] = start, end
+                    keys += [name, f"{name}_end"]
+                    if channel in POSITION_CHANNELS and step is not None:
+                        item["bin"] = {"binned": True, "step": step}
+                        new_encoding.setdefault(
+                            POSITION_CHANNELS[channel], {"field": f"{name}_end"}
+                        )
+                    else:
+                        item.pop("bin")
+                        item["type"] = "ordinal"
+                    item["field"] = name
+                    item.setdefault("title", field)
+                elif item.get("timeUnit"):
+                    name = f"{field}_{item['timeUnit']}"
+                    columns[name] = _time_unit(df[field], item["timeUnit"])
+                    keys.append(name)
+                    item["field"] = name
+                    item.setdefault("title", field)
+                else:
+                    columns[field] = df[field]
+                    keys.append(field)
+
+            sort = item.get("sort")
+            if isinstance(sort, dict) and sort.get("op"):
+                if sort["op"] not in AGGREGATES:
+                    raise Unsupported(f"sort op {sort['op']!r}")
+                if sort.get("field") is not None and sort["field"] not in df.columns:
+                    raise Unsupported(f"sort field {sort['field']!r}")
+                name = _output_name(sort["op"], sort.get("field"))
+                measures.setdefault(name, (sort["op"], sort.get("field")))
+                item["sort"] = {**sort, "field": name, "op": "max"}
+            rewritten.append(item)
+        new_encoding[channel] = (
+            rewritten if isinstance(definition, list) else rewritten[0]
+        )
+
+    for op, field in measures.values():
+        if field is not None and field in df.columns:
+            columns.setdefault(field, df[field])
+    frame = pd.DataFrame(columns, index=df.index).assign(__row=1)
+    keys = list(dict.fromkeys(keys))
+
+    aggregations = {}
+    for name, (op, field) in measures.items():
+        if op == "count" or field is None:
+            aggregations[name] = pd.NamedAgg(column="__row", aggfunc="size")
+        else:
+            aggregations[name] = pd.NamedAgg(column=field, aggfunc=AGGREGATES[op])
+
+    if keys:
+        result = frame.groupby(keys, dropna=False, sort=True).agg(**aggregations)
+        result = result.reset_index()
+    else:
+        result = pd.DataFrame(
+            {
+                name: [frame[agg.column].agg(agg.aggfunc)]
+                for name, agg in aggregations.items()
+            }
+        )
+
+    truncated = len(result) > max_points
+    if truncated:
+        # Too many groups to draw: keep the largest by the first measure
+        first = next(iter(measures))
+        result = result.nlargest(max_points, first)
+    return result, new_encoding, truncated
+
+
+# --- entry point ---
+
+
+def _records(df: pd.DataFrame) -> list:
+    # NaN/NaT become null, which Vega-Lite treats as missing
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def _referenced_fields(node) -> list:
+    fields = []
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "field" and isinstance(value, str):
+                fields.append(value)
+            else:
+                fields += _referenced_fields(value)
+    elif isinstance(node, list):
+        for value in node:
+            fields += _referenced_fields(value)
+    return fields
+
+
+def chart_data(path: str, spec: dict, max_points: int = CHART_MAX_POINTS):
+    """
+    Data for a Vega-Lite spec over a stored result, never more than
+    `max_points` rows. Aggregated encodings (aggregate, with bin and
+    timeUnit on the group-by fields) are computed here on only the columns
+    the chart uses, and the spec is rewritten to plot the results.
+    Unaggregated line charts are downsampled with LTTB per series; other
+    charts, and specs with transforms or layers, get a uniform sample.
+
+    Returns (spec, values, info) where info says which method was used.
+    """
+    spec = dict(spec)
+    spec.pop("datasets", None)  # data LIDA inlined from its sample
+    total_rows = open_result(path).metadata.num_rows
+    encoding = spec.get("encoding") or {}
+    info = {"source_rows": total_rows, "method": "none"}
+
+    simple = not any(key in spec for key in COMPOSITE_KEYS)
+    fields = _referenced_fields(encoding if simple else spec)
+
+    if simple and any(item.get("aggregate") for _, item in _channel_defs(encoding)):
+        try:
+            df = _read_columns(path, fields)
+            df, encoding, truncated = _aggregate(df, encoding, max_points)
+            spec["encoding"] = encoding
+            info["method"] = "aggregate"
+            info["truncated"] = truncated
+            return _finish(spec, df, info, max_points)
+        except Unsupported as e:
+            logger.info("Chart aggregation falls back to sampling: %s", e)
+
+    x = encoding.get("x") if simple else None
+    y = encoding.get("y") if simple else None
+    if (
+        total_rows > max_points
+        and _mark_type(spec) in LINE_MARKS
+        and isinstance(x, dict)
+        and isinstance(y, dict)
+        and x.get("type") in ("quantitative", "temporal")
+        and not x.get("bin")
+        and not x.get("timeUnit")
+    ):
+        df = _read_columns(path, fields)
+        if x.get("type") == "temporal":
+            df[x["field"]] = _as_datetime(df[x["field"]])
+        color = encoding.get("color")
+        series = color.get("field") if isinstance(color, dict) else None
+        df = _downsample_lines(df, x["field"], y["field"], series, max_points)
+        info["method"] = "lttb"
+        return _finish(spec, df, info, max_points)
+
+    if total_rows > max_points:
+        df = _sample_rows(path, fields, total_rows, max_points)
+        info["method"] = "sample"
+    else:
+        df = _read_columns(path, fields)
+    return _finish(spec, df, info, max_points)
+
+
+def _finish(spec: dict, df: pd.DataFrame, info: dict, max_points: int):
+    values = _records(df.head(max_points))
+    spec["data"] = {"values": values}
+    info["rows"] = len(values)
+    return spec, values, info
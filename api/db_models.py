@@ -25,7 +25,8 @@ class QueryLog(Base):
     query_id = Column(String(32), unique=True, nullable=False)
     user_query = Column(String, nullable=False)
     sql_query = Column(String, nullable=False)
-    status = Column(String(20), nullable=False)  # 'success', 'error', etc.
+    # 'success', 'error', 'cancelled', 'timeout', 'rejected' or 'cache_hit'
+    status = Column(String(20), nullable=False)
     execution_time_ms = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.now)
 
@@ -72,3 +73,79 @@ class ChatMessage(Base):
     created_at = mapped_column(DateTime, default=datetime.now)
 
     session = relationship("ChatSession", back_populates="messages")
+
+
+class GeneratedSqlCache(Base):
+    __tablename__ = "generated_sql_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    data_source_id = Column(String, nullable=False, index=True)
+    question = Column(Text, nullable=False)
+    context_hash = Column(String(64), nullable=True)
+    tables = Column(JSON, nullable=False)  # tables the SQL was generated from
+    schema_hash = Column(String(64), nullable=False)
+    sql = Column(Text, nullable=False)
+    generation_ms = Column(Integer, nullable=True)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.now)
+    last_hit_at = Column(DateTime, nullable=True)
+
+
+class QuerySummary(Base):
+    __tablename__ = "query_summaries"
+
+    query_id = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False)  # 'pending', 'success', 'error'
+    summary = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class ResultCache(Base):
+    __tablename__ = "result_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # datasource + fingerprint
+    data_source_key = Column(String, nullable=False, index=True)
+    fingerprint = Column(Text, nullable=False)  # canonical SQL
+    query_id = Column(String(32), nullable=False)  # stored result being reused
+    total_rows = Column(Integer, nullable=True)
+    execution_time_ms = Column(Integer, nullable=True)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.now)
+    expires_at = Column(DateTime, nullable=False)
+    last_hit_at = Column(DateTime, nullable=True)
+
+
+class QueryJob(Base):
+    __tablename__ = "query_jobs"
+
+    job_id = Column(String(32), primary_key=True)  # also the run's QueryLog id
+    data_source_key = Column(String, nullable=False, index=True)
+    user_key = Column(String, nullable=True)
+    # 'queued', 'running', then the run's outcome ('success', 'error',
+    # 'cancelled', 'timeout', 'rejected' or 'confirm_required')
+    status = Column(String(20), nullable=False)
+    user_query = Column(String, nullable=True)
+    sql_query = Column(String, nullable=False)
+    query_id = Column(String(32), nullable=True)  # stored result, once finished
+    total_rows = Column(Integer, nullable=True)
+    execution_time_ms = Column(Integer, nullable=True)
+    message = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class VisualizationCache(Base):
+    __tablename__ = "visualization_cache"
+
+    # "query:<query_id>" for one result, "schema:<fingerprint>" for any result
+    # with the same columns and shape
+    cache_key = Column(String(80), primary_key=True)
+    query_id = Column(String(32), nullable=False)  # result the chart was made for
+    fingerprint = Column(String(64), nullable=False, index=True)
+    title = Column(Text, nullable=True)
+    spec = Column(JSON, nullable=False)  # LIDA's spec, before data is attached
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.now)
+    last_hit_at = Column(DateTime, nullable=True)
@@ -0,0 +1,139 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from dotenv import load_dotenv
+
+load_dotenv()  # Load from .env file
+
+# --- Pool settings (shared by every user datasource engine) ---
+DS_POOL_SIZE = int(os.getenv("DS_POOL_SIZE", "5"))
+DS_MAX_OVERFLOW = int(os.getenv("DS_MAX_OVERFLOW", "10"))
+DS_POOL_TIMEOUT = int(os.getenv("DS_POOL_TIMEOUT", "30"))
+DS_POOL_RECYCLE = int(os.getenv("DS_POOL_RECYCLE", "1800"))
+DS_POOL_PRE_PING = os.getenv("DS_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# --- Registry limits ---
+DS_MAX_ENGINES = int(os.getenv("DS_MAX_ENGINES", "32"))
+DS_ENGINE_IDLE_SECONDS = int(os.getenv("DS_ENGINE_IDLE_SECONDS", "1800"))
+
+
+class EngineRegistry:
+    """
+    Process-wide cache of SQLAlchemy engines, one per datasource URL.
+
+    Engines are kept in LRU order. When the registry grows past `max_engines`,
+    or an engine has not been used for `idle_seconds`, it is disposed so its
+    pooled connections are closed on the database side as well.
+    """
+
+    def __init__(
+        self,
+        max_engines: int = DS_MAX_ENGINES,
+        idle_seconds: int = DS_ENGINE_IDLE_SECONDS,
+    ):
+        self.max_engines = max_engines
+        self.idle_seconds = idle_seconds
+        self._engines: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _create(self, db_url: str) -> Engine:
+        if db_url.startswith("sqlite"):
+            # SQLite has no server side; the default pool is the right one.
+            return create_engine(db_url, pool_pre_ping=DS_POOL_PRE_PING)
+
+        return create_engine(
+            db_url,
+            poolclass=QueuePool,
+            pool_size=DS_POOL_SIZE,
+            max_overflow=DS_MAX_OVERFLOW,
+            pool_timeout=DS_POOL_TIMEOUT,
+            pool_recycle=DS_POOL_RECYCLE,
+            pool_pre_ping=DS_POOL_PRE_PING,
+        )
+
+    def get(self, db_url: str) -> Engine:
+        now = time.time()
+        evicted = []
+
+        with self._lock:
+            entry = self._engines.get(db_url)
+            if entry is None:
+                entry = {
+                    "engine": self._create(db_url),
+                    "created_at": now,
+                    "checkouts": 0,
+                }
+                self._engines[db_url] = entry
+
+            entry["last_used"] = now
+            entry["checkouts"] += 1
+            self._engines.move_to_end(db_url)
+
+            # Evict idle engines, then trim down to the size limit (LRU first)
+            for key in list(self._engines):
+                if key == db_url:
+                    continue
+                if now - self._engines[key]["last_used"] > self.idle_seconds:
+                    evicted.append(self._engines.pop(key)["engine"])
+
+            while len(self._engines) > self.max_engines:
+                _, old = self._engines.popitem(last=False)
+                evicted.append(old["engine"])
+
+        for old_engine in evicted:
+            old_engine.dispose()
+
+        return entry["engine"]
+
+    def dispose(self, db_url: str) -> bool:
+        with self._lock:
+            entry = self._engines.pop(db_url, None)
+        if entry is None:
+            return False
+        entry["engine"].dispose()
+        return True
+
+    def dispose_all(self):
+        with self._lock:
+            entries = list(self._engines.values())
+            self._engines.clear()
+        for entry in entries:
+            entry["engine"].dispose()
+
+    def stats(self) -> list[dict]:
+        now = time.time()
+        with self._lock:
+            items = list(self._engines.values())
+
+        stats = []
+        for entry in items:
+            engine = entry["engine"]
+            pool = engine.pool
+            info = {
+                "datasource": engine.url.render_as_string(hide_password=True),
+                "dialect": engine.dialect.name,
+                "pool_class": type(pool).__name__,
+                "checkouts": entry["checkouts"],
+                "idle_seconds": int(now - entry["last_used"]),
+                "age_seconds": int(now - entry["created_at"]),
+            }
+            if isinstance(pool, QueuePool):
+                info.update(
+                    {
+                        "pool_size": pool.size(),
+                        "checked_in": pool.checkedin(),
+                        "checked_out": pool.checkedout(),
+                        "overflow": pool.overflow(),
+                    }
+                )
+            stats.append(info)
+        return stats
+
+
+engine_registry = EngineRegistry()
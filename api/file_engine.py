@@ -0,0 +1,315 @@
+import os
+import re
+import glob
+import json
+import uuid
+import threading
+
+import duckdb
+import pyarrow as pa
+from dotenv import load_dotenv
+
+from db_models import DataSource
+from metadata_store import session_scope
+from query_control import query_registry
+from query_runner import (
+    ParquetChunkWriter,
+    finite_batch,
+    FIRST_PAGE_ROWS,
+    RESULT_FETCH_SIZE,
+)
+
+load_dotenv()  # Load from .env file
+
+# Where file datasources live: uploads are written here, and paths given in
+# a datasource config must resolve to somewhere under it
+FILE_DATASOURCE_DIR = os.getenv("FILE_DATASOURCE_DIR", "./data/files")
+# Per-datasource DuckDB limits; empty leaves DuckDB's defaults
+FILE_ENGINE_THREADS = os.getenv("FILE_ENGINE_THREADS", "")
+FILE_ENGINE_MEMORY_LIMIT = os.getenv("FILE_ENGINE_MEMORY_LIMIT", "")
+
+# Table function per file format. Views over these keep DuckDB's projection
+# and filter pushdown: only referenced columns are read, and parquet row
+# groups whose statistics rule out a WHERE clause are skipped.
+READERS = {
+    "parquet": "read_parquet({paths}, union_by_name = true, hive_partitioning = true)",
+    "csv": "read_csv({paths}, union_by_name = true)",
+    "json": "read_json_auto({paths})",
+}
+EXTENSIONS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".csv": "csv",
+    ".tsv": "csv",
+    ".txt": "csv",
+    ".json": "json",
+    ".jsonl": "json",
+    ".ndjson": "json",
+}
+
+TABLE_NAME_PATTERN = re.compile(r"[^A-Za-z0-9_]+")
+
+
+class FileSourceError(ValueError):
+    """A file datasource config that can't be turned into tables."""
+
+
+def table_name(name: str) -> str:
+    name = TABLE_NAME_PATTERN.sub("_", name).strip("_").lower()
+    return name if name and not name[0].isdigit() else f"t_{name}"
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _file_type(path: str, file_type: str = None) -> str:
+    file_type = file_type or EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if file_type not in READERS:
+        raise FileSourceError(
+            f"Unsupported file type for {path}; use one of: {', '.join(READERS)}"
+        )
+    return file_type
+
+
+def _base_directory(path: str) -> str:
+    """The directory a path or glob reads from, for DuckDB's allow-list."""
+    parts = []
+    for part in os.path.abspath(path).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    base = os.sep.join(parts) or os.sep
+    return base if os.path.isdir(base) else os.path.dirname(base)
+
+
+def _resolve_path(path: str) -> str:
+    """
+    `path` (or glob) with symlinks and `..` resolved; relative paths are
+    taken from FILE_DATASOURCE_DIR. Raises FileSourceError unless what it
+    reads from is under FILE_DATASOURCE_DIR.
+    """
+    root = os.path.realpath(FILE_DATASOURCE_DIR)
+    resolved = os.path.realpath(os.path.join(root, os.path.expanduser(path)))
+    if os.path.commonpath([root, _base_directory(resolved)]) != root:
+        raise FileSourceError(f"{path} is outside the file datasource directory")
+    return resolved
+
+
+def parse_sources(name: str, config: dict) -> dict:
+    """
+    Table name -> {"paths": [...], "file_type"} for a file datasource
+    config, either `{"tables": {"sales": "/data/sales/*.parquet", ...}}`
+    (a value may also be a list of paths or `{"path", "file_type"}`) or a
+    single `{"path": ..., "file_type": ...}` named after the datasource.
+    Every path must be under FILE_DATASOURCE_DIR.
+    """
+    tables = config.get("tables")
+    if tables is None:
+        if "path" not in config:
+            raise FileSourceError("A file datasource needs `path` or `tables`")
+        tables = {name: {"path": config["path"], "file_type": config.get("file_type")}}
+
+    sources = {}
+    for table, source in tables.items():
+        if not isinstance(source, dict):
+            source = {"path": source}
+        paths = source.get("path") or source.get("paths")
+        paths = [paths] if isinstance(paths, str) else list(paths or [])
+        if not paths:
+            raise FileSourceError(f"No path given for table {table}")
+        sources[table_name(table)] = {
+            "paths": [_resolve_path(p) for p in paths],
+            "file_type": _file_type(paths[0], source.get("file_type")),
+        }
+    return sources
+
+
+def save_upload(name: str, config: dict) -> dict:
+    """
+    Writes a file uploaded inline (`file_content`) under FILE_DATASOURCE_DIR
+    and returns the config pointing at it instead.
+    """
+    file_type = config.get("file_type")
+    if file_type not in READERS:
+        raise FileSourceError(
+            f"Uploaded {file_type} files are not supported; use one of: "
+            f"{', '.join(READERS)}"
+        )
+    os.makedirs(FILE_DATASOURCE_DIR, exist_ok=True)
+    path = os.path.join(
+        FILE_DATASOURCE_DIR, f"{table_name(name)}-{uuid.uuid4().hex[:8]}.{file_type}"
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(config["file_content"])
+    return {"path": os.path.abspath(path), "file_type": file_type}
+
+
+class FileEngine:
+    """
+    An in-memory DuckDB database with one view per table of a file
+    datasource. Globs are expanded when a query runs, so files added to a
+    directory show up without a refresh. Once the views exist, file access
+    is limited to the datasource's own directories and the configuration is
+    locked, so SQL cannot read (or write) anything else on the server.
+    """
+
+    dialect = "duckdb"
+
+    def __init__(self, sources: dict):
+        config = {}
+        if FILE_ENGINE_THREADS:
+            config["threads"] = int(FILE_ENGINE_THREADS)
+        if FILE_ENGINE_MEMORY_LIMIT:
+            config["memory_limit"] = FILE_ENGINE_MEMORY_LIMIT
+        self.sources = sources
+        self._conn = duckdb.connect(":memory:", config=config)
+
+        directories = set()
+        for table, source in sources.items():
+            paths = "[" + ", ".join(_quote(p) for p in source["paths"]) + "]"
+            reader = READERS[source["file_type"]].format(paths=paths)
+            self._conn.execute(f'CREATE VIEW "{table}" AS SELECT * FROM {reader}')
+            directories.update(_base_directory(p) for p in source["paths"])
+
+        allowed = ", ".join(_quote(d.rstrip(os.sep) + os.sep) for d in directories)
+        self._conn.execute(f"SET allowed_directories = [{allowed}]")
+        self._conn.execute("SET enable_external_access = false")
+        self._conn.execute("SET lock_configuration = true")
+
+    def cursor(self):
+        # Cursors share the database but can run on different threads
+        return self._conn.cursor()
+
+    def table_names(self) -> list[str]:
+        return sorted(self.sources)
+
+    def reflect(self, table_names=None) -> dict:
+        """Same shape as schema_introspection.bulk_reflect; files have no keys."""
+        names = self.table_names() if table_names is None else list(table_names)
+        reflected = {}
+        cursor = self.cursor()
+        try:
+            for name in names:
+                if name not in self.sources:
+                    continue
+                try:
+                    described = cursor.execute(f'DESCRIBE "{name}"').fetchall()
+                except duckdb.Error as e:
+                    print(f"Reflecting file table {name} failed: {e}")
+                    continue
+                reflected[name] = {
+                    "columns": [{"name": row[0], "type": row[1]} for row in described],
+                    "primary_key": [],
+                    "foreign_keys": {},
+                }
+        finally:
+            cursor.close()
+        return reflected
+
+    def close(self):
+        self._conn.close()
+
+
+class FileEngineRegistry:
+    """FileEngines by datasource id, rebuilt when the saved config changes."""
+
+    def __init__(self):
+        self._engines: dict[int, tuple[str, FileEngine]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, datasource_id):
+        """The datasource's FileEngine, or None if it isn't a file datasource."""
+        try:
+            datasource_id = int(datasource_id)
+        except (TypeError, ValueError):
+            return None
+        with session_scope() as session:
+            ds = session.get(DataSource, datasource_id)
+            if ds is None or ds.type != "file":
+                return None
+            name, config = ds.name, ds.config
+
+        with self._lock:
+            entry = self._engines.get(datasource_id)
+            if entry is not None and entry[0] == config:
+                return entry[1]
+            engine = FileEngine(parse_sources(name, json.loads(config)))
+            self._engines[datasource_id] = (config, engine)
+        if entry is not None:
+            entry[1].close()
+        return engine
+
+    def invalidate(self, datasource_id=None) -> int:
+        with self._lock:
+            if datasource_id is None:
+                removed = list(self._engines.values())
+                self._engines.clear()
+            else:
+                entry = self._engines.pop(int(datasource_id), None)
+                removed = [entry] if entry else []
+        for _, engine in removed:
+            engine.close()
+        return len(removed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                str(ds_id): {"tables": engine.table_names()}
+                for ds_id, (_, engine) in self._engines.items()
+            }
+
+
+file_engines = FileEngineRegistry()
+
+
+def is_file_config(cfg) -> bool:
+    return (cfg.dialect or "").lower() == "duckdb"
+
+
+def stream_query_to_parquet(
+    engine: FileEngine,
+    sql: str,
+    path: str,
+    first_page_rows: int = FIRST_PAGE_ROWS,
+    fetch_size: int = RESULT_FETCH_SIZE,
+    query_id: str = None,
+    timeout_ms: int = None,
+):
+    """
+    query_runner.stream_query_to_parquet for a file datasource. DuckDB hands
+    back Arrow record batches, which go to the parquet writer with only
+    non-finite floats nulled, without a round trip through Python rows. Yields `(columns, batch)`;
+    the first batch is cut to `first_page_rows`.
+    """
+    writer = ParquetChunkWriter(path)
+    cursor = engine.cursor()
+    try:
+        with query_registry.track_cursor(
+            query_id or uuid.uuid4().hex, FileEngine.dialect, cursor, sql, timeout_ms
+        ) as running:
+            reader = cursor.execute(sql).fetch_record_batch(fetch_size)
+            columns = reader.schema.names
+            sent = False
+            for batch in reader:
+                running.check()
+                pieces = [batch]
+                if not sent and batch.num_rows > first_page_rows:
+                    pieces = [
+                        batch.slice(0, first_page_rows),
+                        batch.slice(first_page_rows),
+                    ]
+                for piece in pieces:
+                    piece = writer.conform(finite_batch(piece))
+                    writer.write(piece)
+                    sent = True
+                    yield columns, piece
+            if not sent:
+                batch = writer.conform(
+                    pa.RecordBatch.from_pylist([], schema=reader.schema)
+                )
+                writer.write(batch)
+                yield columns, batch
+    finally:
+        writer.close()
+        cursor.close()
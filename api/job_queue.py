@@ -0,0 +1,311 @@
+import os
+import json
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from db_models import DataSource, QueryJob
+from metadata_store import session_scope
+from query_control import query_registry, QueryCancelled
+
+load_dotenv()  # Load from .env file
+
+# Worker threads shared by all datasources
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+# Running jobs per datasource, unless its saved config sets `max_concurrency`
+JOB_DATASOURCE_CONCURRENCY = int(os.getenv("JOB_DATASOURCE_CONCURRENCY", "2"))
+# Waiting jobs allowed per datasource, and per user on one datasource
+JOB_QUEUE_MAX_PER_DATASOURCE = int(os.getenv("JOB_QUEUE_MAX_PER_DATASOURCE", "100"))
+JOB_QUEUE_MAX_PER_USER = int(os.getenv("JOB_QUEUE_MAX_PER_USER", "20"))
+
+FINISHED_STATUSES = {
+    "success",
+    "error",
+    "cancelled",
+    "timeout",
+    "rejected",
+    "confirm_required",
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id: str, datasource_key: str, user_key: str, config, run):
+        self.job_id = job_id
+        self.datasource_key = datasource_key
+        self.user_key = user_key
+        self.config = config
+        self.run = run  # run(config, job_id, on_progress) -> response dict
+        self.status = "queued"
+        self.rows = 0
+        # Set by a cancel that came before the query was registered to run
+        self.cancel_requested = False
+
+    def progress(self, rows: int):
+        if self.cancel_requested:
+            raise QueryCancelled("cancelled")
+        self.rows = rows
+
+
+class DatasourceQueue:
+    """
+    Waiting jobs for one datasource, one FIFO per user. Users take turns, so
+    a user with a long backlog delays others by at most one job each round.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self.queued = 0
+        self.users: "OrderedDict[str, deque[Job]]" = OrderedDict()
+
+    def push(self, job: Job):
+        if self.queued >= JOB_QUEUE_MAX_PER_DATASOURCE:
+            raise QueueFull("Too many queries are waiting on this datasource")
+        if len(self.users.get(job.user_key, ())) >= JOB_QUEUE_MAX_PER_USER:
+            raise QueueFull("Too many of your queries are waiting on this datasource")
+        self.users.setdefault(job.user_key, deque()).append(job)
+        self.queued += 1
+
+    def pop(self) -> Job:
+        user_key, user_jobs = self.users.popitem(last=False)
+        job = user_jobs.popleft()
+        if user_jobs:
+            self.users[user_key] = user_jobs  # back of the line
+        self.queued -= 1
+        return job
+
+    def remove(self, job: Job) -> bool:
+        user_jobs = self.users.get(job.user_key)
+        if not user_jobs or job not in user_jobs:
+            return False
+        user_jobs.remove(job)
+        if not user_jobs:
+            del self.users[job.user_key]
+        self.queued -= 1
+        return True
+
+    def can_start(self) -> bool:
+        return self.queued > 0 and self.running < self.max_concurrency
+
+
+def _save(job_id: str, **fields):
+    with session_scope() as session:
+        record = session.get(QueryJob, job_id) or QueryJob(job_id=job_id)
+        for name, value in fields.items():
+            setattr(record, name, value)
+        session.merge(record)
+        session.commit()
+
+
+def datasource_concurrency(datasource_id) -> int:
+    """
+    Running-job cap for a datasource: `max_concurrency` from its saved
+    config, else JOB_DATASOURCE_CONCURRENCY. Never taken from the request,
+    since the cap is shared by every user of the datasource.
+    """
+    if datasource_id is None:
+        return JOB_DATASOURCE_CONCURRENCY
+    with session_scope() as session:
+        ds = session.get(DataSource, int(datasource_id))
+        config = ds.config if ds is not None else None
+    try:
+        cap = json.loads(config or "{}").get("max_concurrency")
+    except (ValueError, AttributeError):
+        cap = None
+    if isinstance(cap, int) and not isinstance(cap, bool) and cap > 0:
+        return cap
+    return JOB_DATASOURCE_CONCURRENCY
+
+
+class JobQueue:
+    """
+    Runs submitted queries on a fixed worker pool. Each datasource has its own
+    concurrency cap and bounded queue, so a slow warehouse fills its own slots
+    rather than every worker (or the API threadpool). Job state is kept in
+    the query_jobs table.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="query-job"
+        )
+        self._datasources: "OrderedDict[str, DatasourceQueue]" = OrderedDict()
+        self._jobs: dict[str, Job] = {}
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def submit(self, job: Job):
+        """Queues a job; raises QueueFull when its datasource or user is at the limit."""
+        max_concurrency = datasource_concurrency(job.config.datasource_id)
+        # Saved before any worker can pick the job up, and outside the lock
+        # so a slow metadata DB doesn't stall dispatch and cancels
+        _save(
+            job.job_id,
+            data_source_key=job.datasource_key,
+            user_key=job.user_key,
+            status="queued",
+            user_query=job.config.user_query,
+            sql_query=job.config.sql,
+            created_at=datetime.now(),
+        )
+        try:
+            with self._lock:
+                queue = self._datasources.get(job.datasource_key)
+                if queue is None:
+                    queue = DatasourceQueue(max_concurrency)
+                    self._datasources[job.datasource_key] = queue
+                queue.max_concurrency = max_concurrency
+                queue.push(job)
+                self._jobs[job.job_id] = job
+        except QueueFull as e:
+            _save(
+                job.job_id,
+                status="rejected",
+                message=str(e),
+                finished_at=datetime.now(),
+            )
+            raise
+        self._dispatch()
+
+    def _dispatch(self):
+        with self._lock:
+            while self._running < self.workers:
+                # Rotate datasources so each gets a turn at a free worker
+                ready = next(
+                    (key for key, q in self._datasources.items() if q.can_start()),
+                    None,
+                )
+                if ready is None:
+                    return
+                self._datasources.move_to_end(ready)
+                queue = self._datasources[ready]
+                job = queue.pop()
+                job.status = "running"
+                queue.running += 1
+                self._running += 1
+                self._executor.submit(self._run, job)
+
+    def _run(self, job: Job):
+        response = {}
+        try:
+            _save(job.job_id, status="running", started_at=datetime.now())
+            if job.cancel_requested:
+                raise QueryCancelled("cancelled")
+            response = job.run(job.config, job.job_id, job.progress)
+        except QueryCancelled as e:
+            response = {"status": "error", "query_status": e.reason, "message": str(e)}
+        except Exception as e:
+            response = {"status": "error", "message": str(e)}
+        finally:
+            status = response.get("query_status") or response.get("status", "error")
+            try:
+                _save(
+                    job.job_id,
+                    status=status,
+                    query_id=response.get("query_id"),
+                    total_rows=response.get("total_rows"),
+                    execution_time_ms=response.get("execution_time_ms"),
+                    message=response.get("message"),
+                    finished_at=datetime.now(),
+                )
+            except Exception as e:
+                print(f"Saving job {job.job_id} failed: {e}")
+            with self._lock:
+                job.status = status
+                self._jobs.pop(job.job_id, None)
+                self._datasources[job.datasource_key].running -= 1
+                self._running -= 1
+            self._dispatch()
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Drops a queued job, or cancels a running one on the backend. A job
+        that a worker has picked up but whose query isn't registered yet is
+        flagged, and stops before (or as soon as) its query starts.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            dequeued = job.status == "queued" and self._datasources[
+                job.datasource_key
+            ].remove(job)
+            if dequeued:
+                self._jobs.pop(job_id, None)
+                job.status = "cancelled"
+            else:
+                job.cancel_requested = True
+        if dequeued:
+            _save(job_id, status="cancelled", finished_at=datetime.now())
+            return True
+        query_registry.cancel(job_id, "cancelled")
+        return True
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            live = {"rows_fetched": job.rows} if job is not None else {}
+        with session_scope() as session:
+            record = session.get(QueryJob, job_id)
+            if record is None:
+                return None
+            return {
+                "job_id": record.job_id,
+                "status": record.status,
+                "query_id": record.query_id,
+                "total_rows": record.total_rows,
+                "execution_time_ms": record.execution_time_ms,
+                "message": record.message,
+                "created_at": record.created_at,
+                "started_at": record.started_at,
+                "finished_at": record.finished_at,
+                **live,
+            }
+
+    def recover(self) -> int:
+        """Marks jobs left queued or running by a previous process as failed."""
+        with session_scope() as session:
+            count = (
+                session.query(QueryJob)
+                .filter(QueryJob.status.in_(["queued", "running"]))
+                .update(
+                    {
+                        "status": "error",
+                        "message": "Interrupted by a server restart",
+                        "finished_at": datetime.now(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            session.commit()
+        return count
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "datasources": {
+                    key: {
+                        "running": queue.running,
+                        "queued": queue.queued,
+                        "max_concurrency": queue.max_concurrency,
+                        "users_waiting": len(queue.users),
+                    }
+                    for key, queue in self._datasources.items()
+                },
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_queue = JobQueue()
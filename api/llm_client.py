@@ -0,0 +1,99 @@
+import os
+import asyncio
+from typing import AsyncGenerator
+
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+
+load_dotenv()  # Load from .env file
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_STREAM_IDLE_SECONDS = float(os.getenv("LLM_STREAM_IDLE_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+_client = None
+_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+class LLMTimeoutError(Exception):
+    pass
+
+
+def get_async_client() -> AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            timeout=LLM_TIMEOUT_SECONDS,
+            max_retries=1,
+        )
+    return _client
+
+
+def set_async_client(client):
+    """Swap the client, e.g. for a local stub server or a different provider."""
+    global _client
+    _client = client
+
+
+async def complete(
+    messages: list, model: str = LLM_MODEL, timeout: float = None, **kwargs
+) -> str:
+    """
+    Single non-streaming chat completion. At most LLM_MAX_CONCURRENCY calls run
+    at once per worker; the rest wait without blocking the event loop.
+    """
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    async with _semaphore:
+        try:
+            response = await asyncio.wait_for(
+                get_async_client().chat.completions.create(
+                    model=model, messages=messages, **kwargs
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:.0f}s")
+    return response.choices[0].message.content.strip()
+
+
+async def stream(
+    messages: list, model: str = LLM_MODEL, timeout: float = None, **kwargs
+) -> AsyncGenerator[str, None]:
+    """
+    Streaming chat completion yielding content deltas. `timeout` bounds the time
+    to the first response; each later chunk must arrive within
+    LLM_STREAM_IDLE_SECONDS.
+    """
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    async with _semaphore:
+        try:
+            response = await asyncio.wait_for(
+                get_async_client().chat.completions.create(
+                    model=model, messages=messages, stream=True, **kwargs
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:.0f}s")
+
+        chunks = response.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(
+                    chunks.__anext__(), LLM_STREAM_IDLE_SECONDS
+                )
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                raise LLMTimeoutError(
+                    f"LLM stream stalled for {LLM_STREAM_IDLE_SECONDS:.0f}s"
+                )
+
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
@@ -0,0 +1,82 @@
+import os
+import json
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from dotenv import load_dotenv
+
+from db_models import DataSource
+
+load_dotenv()  # Load from .env file
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+METADATA_POOL_SIZE = int(os.getenv("METADATA_POOL_SIZE", "10"))
+METADATA_MAX_OVERFLOW = int(os.getenv("METADATA_MAX_OVERFLOW", "20"))
+METADATA_POOL_RECYCLE = int(os.getenv("METADATA_POOL_RECYCLE", "1800"))
+
+# --- The one engine for the app's own metadata database ---
+if DATABASE_URL and DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=METADATA_POOL_SIZE,
+        max_overflow=METADATA_MAX_OVERFLOW,
+        pool_recycle=METADATA_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+SessionLocal = sessionmaker(bind=engine)
+
+
+@contextmanager
+def session_scope():
+    """
+    Yields a session bound to the shared metadata engine. The session is always
+    closed on exit, so its connection goes back to the pool even on errors.
+    """
+    session = SessionLocal()
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def get_inspector():
+    """Inspector over the metadata engine; reflection reuses the same pool."""
+    return inspect(engine)
+
+
+# What a request must share with a saved database datasource to be treated as it
+CONNECTION_FIELDS = ("dialect", "host", "port", "database", "username", "password")
+
+
+def saved_datasource_config(cfg):
+    """
+    Saved config of the datasource a request runs against, or None. Requests
+    are client input, so `cfg.datasource_id` alone is not trusted: a database
+    request must also connect with that datasource's saved credentials (file
+    datasources always run on their saved config).
+    """
+    try:
+        datasource_id = int(getattr(cfg, "datasource_id", None))
+    except (TypeError, ValueError):
+        return None
+    with session_scope() as session:
+        ds = session.get(DataSource, datasource_id)
+        if ds is None:
+            return None
+        ds_type, config = ds.type, json.loads(ds.config)
+
+    if ds_type == "file":
+        return config if (cfg.dialect or "").lower() == "duckdb" else None
+    for field in CONNECTION_FIELDS:
+        if str(config.get(field) or "") != str(getattr(cfg, field, None) or ""):
+            return None
+    return config
@@ -0,0 +1,269 @@
+import os
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from dotenv import load_dotenv
+
+from result_reader import open_result
+
+load_dotenv()  # Load from .env file
+
+PROFILE_TOP_K = int(os.getenv("PROFILE_TOP_K", "5"))
+# Profiles kept in memory, by result file; stored results never change
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "128"))
+
+# HyperLogLog precision: 2**14 registers, about 0.8% standard error
+HLL_PRECISION = 14
+# Text columns whose distinct values make up less than this share of the
+# rows are categories rather than free text (the rule LIDA uses)
+CATEGORY_MAX_RATIO = 0.5
+QUANTILES = [0.25, 0.5, 0.75]
+
+
+def hll_distinct(hashes: np.ndarray, precision: int = HLL_PRECISION) -> int:
+    """
+    Approximate number of distinct values from their 64-bit hashes, using a
+    HyperLogLog sketch built with vectorized NumPy (no per-value Python).
+    """
+    if len(hashes) == 0:
+        return 0
+    m = 1 << precision
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # Position of the first set bit of the remaining 50 bits; they fit a
+    # float64 mantissa exactly, so frexp gives the bit length
+    _, bit_length = np.frexp(rest.astype(np.float64))
+    rank = (64 - precision) - bit_length + 1
+    # Max rank per register without a scatter-max (np.maximum.at is slow):
+    # count (register, rank) pairs, then take each register's highest rank
+    counts = np.bincount(index * 64 + rank, minlength=m * 64).reshape(m, 64)
+    present = counts > 0
+    registers = np.where(
+        present.any(axis=1), 63 - np.argmax(present[:, ::-1], axis=1), 0
+    )
+
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    empty = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and empty:
+        estimate = m * math.log(m / empty)  # linear counting for small sets
+    return int(round(estimate))
+
+
+def _hashes(values: pa.Array) -> np.ndarray:
+    array = values.to_numpy(zero_copy_only=False)
+    return pd.util.hash_array(array, categorize=False)
+
+
+def _scalar(value):
+    value = value.as_py() if isinstance(value, pa.Scalar) else value
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _dtype(kind: pa.DataType) -> str:
+    if pa.types.is_boolean(kind):
+        return "boolean"
+    if (
+        pa.types.is_integer(kind)
+        or pa.types.is_floating(kind)
+        or pa.types.is_decimal(kind)
+    ):
+        return "number"
+    if pa.types.is_temporal(kind):
+        return "date"
+    if pa.types.is_string(kind) or pa.types.is_large_string(kind):
+        return "string"
+    return str(kind)
+
+
+def _top_values(column: pa.ChunkedArray, top_k: int):
+    counts = pc.value_counts(column)
+    values = counts.field("values")
+    frequencies = counts.field("counts")
+    valid = pc.is_valid(values)
+    values, frequencies = values.filter(valid), frequencies.filter(valid)
+    order = pc.array_sort_indices(frequencies, order="descending")[:top_k]
+    top = [
+        {"value": _scalar(values[i]), "count": frequencies[i].as_py()}
+        for i in order.to_pylist()
+    ]
+    return len(values), top
+
+
+def profile_column(column: pa.ChunkedArray, top_k: int = PROFILE_TOP_K) -> dict:
+    kind = column.type
+    if pa.types.is_dictionary(kind):
+        column = column.cast(kind.value_type)
+        kind = kind.value_type
+    rows = len(column)
+    nulls = column.null_count
+    valid = pc.drop_null(column)
+    profile = {"dtype": _dtype(kind), "nulls": nulls, "count": rows - nulls}
+    if not len(valid):
+        profile["distinct"] = 0
+        return profile
+
+    if profile["dtype"] in ("string", "boolean"):
+        profile["distinct"], profile["top"] = _top_values(valid, top_k)
+        profile["distinct_approx"] = False
+        if profile["dtype"] == "string":
+            ratio = profile["distinct"] / len(valid)
+            if ratio < CATEGORY_MAX_RATIO:
+                profile["dtype"] = "category"
+            lengths = pc.utf8_length(valid)
+            profile["mean_length"] = _scalar(pc.mean(lengths))
+        return profile
+
+    if profile["dtype"] == "number":
+        numbers = valid.cast(pa.float64()) if pa.types.is_decimal(kind) else valid
+        min_max = pc.min_max(numbers)
+        profile["min"] = _scalar(min_max["min"])
+        profile["max"] = _scalar(min_max["max"])
+        profile["mean"] = _scalar(pc.mean(numbers))
+        profile["std"] = _scalar(pc.stddev(numbers, ddof=1)) if len(valid) > 1 else None
+        quantiles = pc.quantile(numbers, q=QUANTILES)
+        profile["quantiles"] = dict(
+            zip(("p25", "p50", "p75"), (_scalar(q) for q in quantiles))
+        )
+        hashed = numbers
+    elif profile["dtype"] == "date":
+        min_max = pc.min_max(valid)
+        profile["min"] = _scalar(min_max["min"])
+        profile["max"] = _scalar(min_max["max"])
+        try:
+            span = profile["max"] - profile["min"]
+            profile["span_days"] = round(span.total_seconds() / 86400, 3)
+        except TypeError:
+            pass  # times of day
+        hashed = valid.cast(pa.int32() if kind.bit_width == 32 else pa.int64())
+    else:
+        return profile
+
+    profile["distinct"] = hll_distinct(
+        np.concatenate([_hashes(chunk) for chunk in hashed.chunks])
+    )
+    profile["distinct_approx"] = True
+    return profile
+
+
+class ProfileCache:
+    """Profiles by result file path and modification time, LRU."""
+
+    def __init__(self, size: int = PROFILE_CACHE_SIZE):
+        self.size = size
+        self._profiles: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is not None:
+                self._profiles.move_to_end(key)
+            return profile
+
+    def put(self, key, profile: dict):
+        with self._lock:
+            self._profiles[key] = profile
+            self._profiles.move_to_end(key)
+            while len(self._profiles) > self.size:
+                self._profiles.popitem(last=False)
+
+
+profile_cache = ProfileCache()
+
+
+def profile_result(path: str, top_k: int = PROFILE_TOP_K) -> dict:
+    """
+    Profile of a whole stored result, computed column by column with Arrow
+    compute kernels: dtype, null count, min/max/mean/std and quartiles for
+    numbers, ranges for dates, top values for text, and distinct counts
+    (HyperLogLog for numbers and dates, exact for text).
+    """
+    key = (path, os.path.getmtime(path), top_k)
+    profile = profile_cache.get(key)
+    if profile is not None:
+        return profile
+
+    parquet_file = open_result(path)
+    profile = {"rows": parquet_file.metadata.num_rows, "columns": {}}
+    for name in parquet_file.schema_arrow.names:
+        column = parquet_file.read(columns=[name]).column(0)
+        profile["columns"][name] = profile_column(column, top_k)
+    profile_cache.put(key, profile)
+    return profile
+
+
+def _samples(column: dict) -> list:
+    if "top" in column:
+        return [str(item["value"]) for item in column["top"][:3]]
+    return [str(column[k]) for k in ("min", "max") if column.get(k) is not None]
+
+
+def lida_summary(profile: dict, name: str) -> dict:
+    """
+    The profile in the shape `lida.summarize` returns, so goal and chart
+    generation can use it in place of a summary of a 200-row sample.
+    """
+    fields = []
+    for column_name, column in profile["columns"].items():
+        properties = {
+            "dtype": column["dtype"],
+            "samples": _samples(column),
+            "num_unique_values": column.get("distinct", 0),
+            "semantic_type": "",
+            "description": "",
+        }
+        for key in ("min", "max", "std"):
+            if column.get(key) is not None:
+                properties[key] = (
+                    column[key]
+                    if isinstance(column[key], (int, float))
+                    else str(column[key])
+                )
+        fields.append({"column": column_name, "properties": properties})
+    return {
+        "name": name,
+        "file_name": f"{name}.parquet",
+        "dataset_description": f"{profile['rows']} rows",
+        "fields": fields,
+        "field_names": list(profile["columns"]),
+    }
+
+
+def _format(value, spec: str = "") -> str:
+    """Formats one profile value; non-finite numbers were profiled as None."""
+    return "n/a" if value is None else format(value, spec)
+
+
+def describe(profile: dict) -> str:
+    """The profile as compact markdown, one line per column, for prompts."""
+    lines = [f"{profile['rows']} rows"]
+    for column_name, column in profile["columns"].items():
+        parts = [column["dtype"]]
+        if column["nulls"]:
+            parts.append(f"{column['nulls']} nulls")
+        approx = "~" if column.get("distinct_approx") else ""
+        parts.append(f"{approx}{column.get('distinct', 0)} distinct")
+        if "min" in column:
+            parts.append(f"range {_format(column['min'])} to {_format(column['max'])}")
+        if column.get("mean") is not None:
+            parts.append(f"mean {column['mean']:.4g}")
+        if column.get("quantiles"):
+            parts.append(
+                "quartiles "
+                + " / ".join(_format(q, ".4g") for q in column["quantiles"].values())
+            )
+        if column.get("top"):
+            parts.append(
+                "top "
+                + ", ".join(f"{t['value']} ({t['count']})" for t in column["top"])
+            )
+        lines.append(f"- {column_name}: " + "; ".join(parts))
+    return "\n".join(lines)
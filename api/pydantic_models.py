@@ -43,20 +43,38 @@ class FixSqlRequest(BaseModel):
     error_message: Optional[str] = None  # optionally pass in the error
 
 
+class ValidateSqlRequest(BaseModel):
+    sql: str
+    datasource_id: int
+    dialect: Optional[str] = None  # target dialect; defaults to the datasource's
+    source_dialect: str = "postgres"  # dialect the SQL is written in
+
+
 class UserQuery(BaseModel):
     question: str
     datasource_id: int
 
 
 class DBConfig(BaseModel):
-    dialect: str  # e.g., "postgresql", "mysql", "sqlite"
-    username: str  # e.., "myuser"
-    password: str  # e.g., "mypassword"
-    host: str  # e.g., "localhost"
-    port: int  # e.g., 5432
-    database: str  # e.g., "mydb"
+    dialect: str  # e.g., "postgresql", "mysql", "sqlite"; "duckdb" for file datasources
+    username: str = ""  # e.., "myuser"
+    password: str = ""  # e.g., "mypassword"
+    host: str = ""  # e.g., "localhost"
+    port: int = 0  # e.g., 5432
+    database: str = ""  # e.g., "mydb"
     sql: Optional[str] = ""  # The query to run
     user_query: Optional[str] = ""
+    datasource_id: Optional[int] = (
+        None  # saved datasource; results are cached only for those
+    )
+    result_cache_ttl: Optional[int] = (
+        None  # seconds; shortens the datasource's, 0 disables
+    )
+    use_cache: bool = True  # False always runs the query
+    statement_timeout_ms: Optional[int] = None  # shortens the server's timeout
+    query_id: Optional[str] = None  # client-chosen id, to cancel before it returns
+    max_rows: Optional[int] = None  # lowers the server's LIMIT cap, never raises it
+    confirmed: bool = False  # run even if EXPLAIN puts the query over the confirm level
 
 
 class DataSourceSchema(BaseModel):
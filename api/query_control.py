@@ -0,0 +1,281 @@
+import os
+import re
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from metadata_store import saved_datasource_config
+
+load_dotenv()  # Load from .env file
+
+# Statement timeout for user queries, unless the datasource's saved config sets
+# `statement_timeout_ms`; a request's own value can only shorten it
+STATEMENT_TIMEOUT_MS = int(os.getenv("STATEMENT_TIMEOUT_MS", "300000"))
+
+# Client-chosen query ids must also fit QueryLog.query_id
+CLIENT_QUERY_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,32}")
+
+# Driver messages for a statement stopped by a server-side timeout
+SERVER_TIMEOUT_MARKERS = (
+    "statement timeout",  # PostgreSQL
+    "maximum statement execution time exceeded",  # MySQL
+    "reached its timeout",  # Snowflake
+)
+
+
+class QueryCancelled(Exception):
+    """A query stopped on purpose; `reason` is "cancelled" or "timeout"."""
+
+    def __init__(self, reason: str, message: str = None):
+        super().__init__(message or f"Query {reason}")
+        self.reason = reason
+
+
+def new_query_id(requested: str = None) -> str:
+    if not requested:
+        return uuid.uuid4().hex
+    if not CLIENT_QUERY_ID_PATTERN.fullmatch(requested):
+        raise ValueError("query_id must be 1-32 letters, digits, '-' or '_' characters")
+    return requested
+
+
+def _datasource_timeout_ms(cfg) -> int:
+    saved = (saved_datasource_config(cfg) or {}).get("statement_timeout_ms")
+    if isinstance(saved, int) and not isinstance(saved, bool) and saved >= 0:
+        return saved
+    return STATEMENT_TIMEOUT_MS
+
+
+def timeout_ms_for(cfg) -> int:
+    """
+    The datasource's saved `statement_timeout_ms` (else STATEMENT_TIMEOUT_MS;
+    0 means none), or the request's `statement_timeout_ms` when that is
+    shorter. A request can't lengthen or disable the datasource's timeout.
+    """
+    limit_ms = _datasource_timeout_ms(cfg)
+    timeout_ms = getattr(cfg, "statement_timeout_ms", None)
+    if timeout_ms is None or timeout_ms <= 0:
+        return limit_ms
+    return min(timeout_ms, limit_ms) if limit_ms else timeout_ms
+
+
+class RunningQuery:
+    def __init__(
+        self,
+        query_id: str,
+        dialect: str,
+        dbapi_connection,
+        sql: str,
+        timeout_ms: int,
+        engine=None,
+    ):
+        self.query_id = query_id
+        self.engine = engine
+        self.dialect = dialect
+        self.dbapi_connection = dbapi_connection
+        self.sql = sql
+        self.timeout_ms = timeout_ms
+        self.started_at = time.time()
+        self.backend_id = None
+        self.reason = None
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Raises QueryCancelled between fetches once a cancel was requested."""
+        if self.reason is not None:
+            raise QueryCancelled(self.reason)
+
+    def cancel(self, reason: str) -> bool:
+        # Held while cancelling, so the connection cannot be handed back to
+        # the pool (and to another query) while a cancel is still in flight
+        with self._lock:
+            if self.reason is not None or self.finished:
+                return False
+            self.reason = reason
+            try:
+                self._cancel_backend()
+            except Exception as e:
+                print(f"Backend cancel for {self.query_id} failed: {e}")
+        return True
+
+    def finish(self):
+        with self._lock:
+            self.finished = True
+
+    def _cancel_backend(self):
+        if self.dialect in ("sqlite", "duckdb"):
+            self.dbapi_connection.interrupt()
+        elif hasattr(self.dbapi_connection, "cancel"):
+            # psycopg2/psycopg send a protocol-level cancel for this backend
+            self.dbapi_connection.cancel()
+        elif self.dialect == "postgresql" and self.backend_id is not None:
+            self._run_on_new_connection(f"SELECT pg_cancel_backend({self.backend_id})")
+        elif self.dialect in ("mysql", "mariadb") and self.backend_id is not None:
+            self._run_on_new_connection(f"KILL QUERY {self.backend_id}")
+        elif self.dialect == "snowflake" and self.backend_id is not None:
+            self._run_on_new_connection(
+                f"SELECT SYSTEM$CANCEL_ALL_QUERIES({self.backend_id})"
+            )
+
+    def _run_on_new_connection(self, statement: str):
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql(statement)
+
+    def info(self) -> dict:
+        return {
+            "query_id": self.query_id,
+            "dialect": self.dialect,
+            "sql": self.sql,
+            "running_ms": int((time.time() - self.started_at) * 1000),
+            "timeout_ms": self.timeout_ms,
+            "cancel_requested": self.reason,
+        }
+
+
+def _prepare_connection(running: RunningQuery, conn):
+    """
+    Applies the statement timeout on the server and records the backend id
+    used for cancelling. Returns a callback that undoes session-level
+    settings before the connection goes back to the pool.
+    """
+    timeout_ms = running.timeout_ms
+    if running.dialect == "postgresql":
+        if timeout_ms:
+            # Transaction-scoped, so it ends with this query's transaction
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+        if not hasattr(running.dbapi_connection, "cancel"):
+            running.backend_id = conn.exec_driver_sql(
+                "SELECT pg_backend_pid()"
+            ).scalar()
+    elif running.dialect in ("mysql", "mariadb"):
+        running.backend_id = conn.exec_driver_sql("SELECT CONNECTION_ID()").scalar()
+        if timeout_ms and running.dialect == "mysql":
+            conn.exec_driver_sql(f"SET SESSION max_execution_time = {int(timeout_ms)}")
+            return lambda: conn.exec_driver_sql("SET SESSION max_execution_time = 0")
+    elif running.dialect == "snowflake":
+        running.backend_id = getattr(running.dbapi_connection, "session_id", None)
+        if timeout_ms:
+            seconds = max(1, int(timeout_ms) // 1000)
+            conn.exec_driver_sql(
+                f"ALTER SESSION SET STATEMENT_TIMEOUT_IN_SECONDS = {seconds}"
+            )
+            return lambda: conn.exec_driver_sql(
+                "ALTER SESSION UNSET STATEMENT_TIMEOUT_IN_SECONDS"
+            )
+    return None
+
+
+class QueryRegistry:
+    """In-flight queries by query_id, so another request can cancel them."""
+
+    def __init__(self):
+        self._running: dict[str, RunningQuery] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, query_id: str, engine, conn, sql: str, timeout_ms: int = None):
+        """
+        Registers the query running on `conn` for the duration of the block.
+        The timeout is enforced by the server where the dialect supports it,
+        and by a watchdog that cancels the backend at the deadline otherwise
+        (and for time spent fetching). Errors caused by a cancel or timeout
+        are re-raised as QueryCancelled.
+        """
+        running = RunningQuery(
+            query_id,
+            engine.dialect.name,
+            conn.connection.dbapi_connection,
+            sql,
+            timeout_ms,
+            engine,
+        )
+        reset = []
+
+        def release():
+            if running.reason is not None:
+                # Don't return a connection in an unknown state to the pool
+                conn.invalidate()
+            elif reset and reset[0] is not None:
+                reset[0]()
+
+        with self._track(
+            running, lambda: reset.append(_prepare_connection(running, conn)), release
+        ):
+            yield running
+
+    @contextmanager
+    def track_cursor(
+        self, query_id: str, dialect: str, cursor, sql: str, timeout_ms: int = None
+    ):
+        """
+        Same as track() for a DB-API cursor outside SQLAlchemy, such as the
+        DuckDB engine of a file datasource. Only the watchdog enforces the
+        timeout; cancelling interrupts the cursor.
+        """
+        running = RunningQuery(query_id, dialect, cursor, sql, timeout_ms)
+        with self._track(running):
+            yield running
+
+    @contextmanager
+    def _track(self, running: RunningQuery, prepare=None, release=None):
+        if running.timeout_ms is None:
+            running.timeout_ms = STATEMENT_TIMEOUT_MS
+        query_id, timeout_ms = running.query_id, running.timeout_ms
+        with self._lock:
+            if query_id in self._running:
+                raise ValueError(f"Query {query_id} is already running")
+            self._running[query_id] = running
+
+        watchdog = None
+        try:
+            if prepare is not None:
+                prepare()
+            if timeout_ms:
+                watchdog = threading.Timer(
+                    timeout_ms / 1000, running.cancel, args=("timeout",)
+                )
+                watchdog.daemon = True
+                watchdog.start()
+            yield running
+        except QueryCancelled:
+            raise
+        except Exception as e:
+            if running.reason is not None:
+                raise QueryCancelled(running.reason, str(e)) from e
+            if any(marker in str(e).lower() for marker in SERVER_TIMEOUT_MARKERS):
+                raise QueryCancelled("timeout", str(e)) from e
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            running.finish()
+            with self._lock:
+                self._running.pop(query_id, None)
+            if release is not None:
+                try:
+                    release()
+                except Exception as e:
+                    print(f"Releasing connection for {query_id} failed: {e}")
+
+    def cancel(self, query_id: str, reason: str = "cancelled") -> bool:
+        with self._lock:
+            running = self._running.get(query_id)
+        if running is None:
+            return False
+        return running.cancel(reason)
+
+    def is_running(self, query_id: str) -> bool:
+        with self._lock:
+            return query_id in self._running
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            running = list(self._running.values())
+        return [query.info() for query in running]
+
+
+query_registry = QueryRegistry()
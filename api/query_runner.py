@@ -0,0 +1,307 @@
+import os
+import json
+import uuid
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+from query_control import query_registry
+
+load_dotenv()  # Load from .env file
+
+# Rows fetched from the server-side cursor per round trip
+RESULT_FETCH_SIZE = int(os.getenv("RESULT_FETCH_SIZE", "10000"))
+# Size of the first page, sent to the client before the rest is fetched
+FIRST_PAGE_ROWS = int(os.getenv("FIRST_PAGE_ROWS", "100"))
+# Rows per parquet row group; paged reads decode at most one extra group
+RESULT_ROW_GROUP_SIZE = int(os.getenv("RESULT_ROW_GROUP_SIZE", "10000"))
+
+
+def _to_arrow(values: list) -> pa.Array:
+    """
+    One typed Arrow column from driver values. Values Arrow cannot type
+    consistently (mixed types, UUIDs, JSON documents) are kept as text.
+    """
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        array = None
+
+    if array is None or pa.types.is_nested(array.type):
+        array = pa.array(
+            [
+                (
+                    None
+                    if v is None
+                    else (
+                        json.dumps(v, default=str)
+                        if isinstance(v, (dict, list))
+                        else str(v)
+                    )
+                )
+                for v in values
+            ],
+            type=pa.string(),
+        )
+
+    return _finite(array)
+
+
+def _finite(array: pa.Array) -> pa.Array:
+    if pa.types.is_floating(array.type):
+        # NaN and +/-inf become nulls, without boxing a single value
+        non_finite = pc.or_(pc.is_nan(array), pc.is_inf(array))
+        array = pc.if_else(non_finite, pa.scalar(None, array.type), array)
+    return array
+
+
+def finite_batch(batch: pa.RecordBatch) -> pa.RecordBatch:
+    """
+    `batch` with NaN and +/-inf floats as nulls, which JSON can't carry, for
+    engines such as DuckDB that hand back Arrow directly.
+    """
+    if not any(pa.types.is_floating(field.type) for field in batch.schema):
+        return batch
+    return pa.RecordBatch.from_arrays(
+        [_finite(column) for column in batch.columns], schema=batch.schema
+    )
+
+
+def rows_to_batch(rows, columns: list) -> pa.RecordBatch:
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return pa.RecordBatch.from_arrays(
+        [_to_arrow(list(column)) for column in values], names=columns
+    )
+
+
+def batch_to_rows(batch: pa.RecordBatch) -> list[list]:
+    """Row-major lists for the JSON preview, as execute_sql has always returned."""
+    return [list(row) for row in zip(*(col.to_pylist() for col in batch.columns))]
+
+
+# Widest decimal kept as a decimal (decimal128); wider ones are stored as text
+MAX_DECIMAL_PRECISION = 38
+
+
+def _storable(data_type: pa.DataType) -> pa.DataType:
+    if pa.types.is_decimal(data_type) and (
+        pa.types.is_decimal256(data_type) or data_type.precision > MAX_DECIMAL_PRECISION
+    ):
+        return pa.string()
+    return data_type
+
+
+def _decimal(integer_digits: int, scale: int) -> pa.DataType:
+    if integer_digits + scale > MAX_DECIMAL_PRECISION:
+        return pa.string()
+    return pa.decimal128(integer_digits + scale, scale)
+
+
+def _widen(current: pa.DataType, new: pa.DataType) -> pa.DataType:
+    """
+    A type that holds values of both `current` and `new`: the wider number
+    type where one exists, else text.
+    """
+    if current.equals(new) or pa.types.is_null(new):
+        return current
+    if pa.types.is_null(current):
+        return _storable(new)
+    if pa.types.is_string(current):
+        return current
+    pair = (current, new)
+    if any(pa.types.is_decimal(t) for t in pair):
+        if any(pa.types.is_floating(t) for t in pair):
+            return pa.float64()
+        if not all(pa.types.is_decimal(t) or pa.types.is_integer(t) for t in pair):
+            return pa.string()
+        # An integer column needs the 19 integer digits of an int64
+        digits = max(
+            t.precision - t.scale if pa.types.is_decimal(t) else 19 for t in pair
+        )
+        scale = max(t.scale if pa.types.is_decimal(t) else 0 for t in pair)
+        return _decimal(digits, scale)
+    if pa.types.is_integer(current) and pa.types.is_integer(new):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in pair):
+        return pa.float64()
+    return pa.string()
+
+
+def _file_schema(schema: pa.Schema) -> pa.Schema:
+    """Parquet can't store null-typed columns; those are written as text."""
+    return pa.schema(
+        [
+            field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+            for field in schema
+        ]
+    )
+
+
+class ParquetChunkWriter:
+    """
+    Appends record batches to one parquet file. Batches are regrouped into
+    row groups of `row_group_size` rows whatever size the driver fetches in,
+    so readers can locate a page from the footer alone.
+
+    The schema follows the data: a column that is all-null so far takes the
+    first type that turns up, and one whose type changes between batches is
+    widened (int -> float, decimal precision, else text), rewriting any row
+    groups already in the file.
+    """
+
+    def __init__(self, path: str, row_group_size: int = RESULT_ROW_GROUP_SIZE):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.schema = None
+        self.rows = 0
+        self._writer = None
+        self._file = path  # where row groups are written; see _rewrite
+        self._pending: list[pa.RecordBatch] = []
+        self._pending_rows = 0
+
+    def conform(self, batch: pa.RecordBatch) -> pa.RecordBatch:
+        if self.schema is None:
+            self.schema = pa.schema(
+                [field.with_type(_storable(field.type)) for field in batch.schema]
+            )
+        else:
+            widened = pa.schema(
+                [
+                    field.with_type(_widen(field.type, new.type))
+                    for field, new in zip(self.schema, batch.schema)
+                ]
+            )
+            if not widened.equals(self.schema):
+                self._retype(widened)
+        if batch.schema.equals(self.schema):
+            return batch
+
+        columns = []
+        for i, (column, field) in enumerate(zip(batch.columns, self.schema)):
+            try:
+                columns.append(column.cast(field.type))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                # e.g. a value too large for the column's integer or decimal
+                self._retype(self.schema.set(i, field.with_type(pa.string())))
+                columns.append(column.cast(pa.string()))
+        return pa.RecordBatch.from_arrays(columns, schema=self.schema)
+
+    def _retype(self, schema: pa.Schema):
+        previous, self.schema = self.schema, schema
+        self._pending = [
+            pa.RecordBatch.from_arrays(
+                [
+                    column.cast(field.type)
+                    for column, field in zip(batch.columns, schema)
+                ],
+                schema=schema,
+            )
+            for batch in self._pending
+        ]
+        if self._writer is not None and not _file_schema(schema).equals(
+            _file_schema(previous)
+        ):
+            self._rewrite()
+
+    def _rewrite(self):
+        """Copies the row groups written so far into a file of the new schema."""
+        self._writer.close()
+        schema = _file_schema(self.schema)
+        # Named like the file it replaces, so stray copies are cleaned up too
+        target = os.path.join(
+            os.path.dirname(self.path), "widen." + os.path.basename(self.path)
+        )
+        if self._file != self.path:
+            target = self.path
+        writer = pq.ParquetWriter(target, schema)
+        written = pq.ParquetFile(self._file)
+        for i in range(written.num_row_groups):
+            writer.write_table(
+                written.read_row_group(i).cast(schema),
+                row_group_size=self.row_group_size,
+            )
+        written.close()
+        os.remove(self._file)
+        self._writer, self._file = writer, target
+
+    def _flush(self, final: bool = False):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._file, _file_schema(self.schema))
+        table = pa.Table.from_batches(self._pending, schema=self.schema)
+        full = table.num_rows - table.num_rows % self.row_group_size
+        if final or table.num_rows == 0:
+            full = table.num_rows
+        if full or not self.rows:
+            self._writer.write_table(
+                table.slice(0, full).cast(_file_schema(self.schema)),
+                row_group_size=self.row_group_size,
+            )
+        rest = table.slice(full)
+        self._pending = rest.to_batches() if rest.num_rows else []
+        self._pending_rows = rest.num_rows
+
+    def write(self, batch: pa.RecordBatch):
+        batch = self.conform(batch)
+        if batch.num_rows:
+            self._pending.append(batch)
+            self._pending_rows += batch.num_rows
+        self.rows += batch.num_rows
+        if self._pending_rows >= self.row_group_size:
+            self._flush()
+
+    def close(self):
+        if self.schema is not None and (self._pending or self._writer is None):
+            self._flush(final=True)
+        if self._writer is not None:
+            self._writer.close()
+        if self._file != self.path:
+            os.replace(self._file, self.path)
+
+
+def stream_query_to_parquet(
+    engine,
+    sql: str,
+    path: str,
+    first_page_rows: int = FIRST_PAGE_ROWS,
+    fetch_size: int = RESULT_FETCH_SIZE,
+    query_id: str = None,
+    timeout_ms: int = None,
+):
+    """
+    Runs `sql` on a server-side cursor and writes the result to `path` chunk by
+    chunk, so memory stays bounded by `fetch_size` rows however large the
+    result is. Yields `(columns, batch)` after each Arrow record batch is
+    handed to the writer; the same typed batch feeds the parquet file and any
+    JSON preview.
+    The first batch is small so callers can show a page before the rest
+    arrives.
+
+    While it runs the query is registered under `query_id`, so it can be
+    cancelled, and is stopped after `timeout_ms`; both raise QueryCancelled.
+    """
+    writer = ParquetChunkWriter(path)
+    try:
+        with engine.connect() as conn, query_registry.track(
+            query_id or uuid.uuid4().hex, engine, conn, sql, timeout_ms
+        ) as running:
+            result = conn.execution_options(
+                stream_results=True, yield_per=fetch_size
+            ).execute(text(sql))
+            columns = list(result.keys())
+
+            rows = result.fetchmany(first_page_rows)
+            while True:
+                running.check()
+                batch = writer.conform(rows_to_batch(rows, columns))
+                writer.write(batch)
+                yield columns, batch
+                if len(rows) == 0:
+                    break
+                rows = result.fetchmany(fetch_size)
+                if not rows:
+                    break
+    finally:
+        writer.close()
@@ -0,0 +1,84 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+from dotenv import load_dotenv
+
+from db_models import QuerySummary
+from metadata_store import session_scope
+from result_store import result_store
+from profiler import profile_result, describe
+
+load_dotenv()  # Load from .env file
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+SUMMARY_FALLBACK = "Could not generate summary."
+
+# Summaries are produced off the request path, after rows are returned
+summary_executor = ThreadPoolExecutor(
+    max_workers=SUMMARY_WORKERS, thread_name_prefix="summary"
+)
+
+
+def _set_summary(query_id: str, status: str, summary: str = None):
+    with session_scope() as session:
+        record = session.get(QuerySummary, query_id) or QuerySummary(query_id=query_id)
+        record.status = status
+        record.summary = summary
+        session.merge(record)
+        session.commit()
+
+
+def _profile_text(query_id: str) -> str:
+    try:
+        return describe(profile_result(result_store.get(query_id)))
+    except Exception as e:
+        logger.warning("Profiling %s failed: %s", query_id, e)
+        return "Not available"
+
+
+def _summarize(query_id: str, sql: str, preview: str):
+    try:
+        # Statistics over every row, so the summary isn't just about the preview
+        profile = _profile_text(query_id)
+        summary_prompt = f"""
+You're a world class business and data analyst. Summarize the data clearly for business users as key points. No blabber.
+
+Query:
+{sql}
+
+Profile of the full result:
+{profile}
+
+Data (first 5 rows):
+{preview}
+
+Summary:
+"""
+        response = openai.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": summary_prompt}],
+        )
+        _set_summary(query_id, "success", response.choices[0].message.content.strip())
+
+    except Exception as llm_error:
+        logger.exception("Summary for %s failed: %s", query_id, llm_error)
+        _set_summary(query_id, "error", SUMMARY_FALLBACK)
+
+
+def schedule_summary(query_id: str, sql: str, preview: str) -> str:
+    """Queues the business summary for a stored result; returns its status."""
+    _set_summary(query_id, "pending")
+    summary_executor.submit(_summarize, query_id, sql, preview)
+    return "pending"
+
+
+def get_summary(query_id: str):
+    with session_scope() as session:
+        record = session.get(QuerySummary, query_id)
+        if record is None:
+            return None
+        return {"summary_status": record.status, "summary": record.summary}
@@ -0,0 +1,247 @@
+import os
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.optimizer.normalize_identifiers import normalize_identifiers
+from sqlalchemy import func
+from dotenv import load_dotenv
+
+from db_models import ResultCache, QueryLog
+from metadata_store import session_scope, saved_datasource_config
+from result_store import result_store, ResultNotFound
+
+load_dotenv()  # Load from .env file
+
+# Default lifetime of a cached result; a saved datasource's config can set its
+# own `result_cache_ttl` (0 turns caching off for that datasource)
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "600"))
+
+# SQLAlchemy dialect name -> sqlglot dialect
+SQLGLOT_DIALECTS = {
+    "postgresql": "postgres",
+    "postgres": "postgres",
+    "mysql": "mysql",
+    "mariadb": "mysql",
+    "sqlite": "sqlite",
+    "snowflake": "snowflake",
+    "duckdb": "duckdb",
+}
+
+# Functions whose result changes between runs; queries using them are not cached
+VOLATILE_EXPRESSIONS = (
+    exp.CurrentDate,
+    exp.CurrentDatetime,
+    exp.CurrentTime,
+    exp.CurrentTimestamp,
+    exp.Rand,
+)
+VOLATILE_FUNCTIONS = {"NOW", "RANDOM", "UUID", "GEN_RANDOM_UUID", "SYSDATE", "NEWID"}
+
+
+class ResultCacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+
+stats = ResultCacheStats()
+
+
+def sqlglot_dialect(dialect: str):
+    return SQLGLOT_DIALECTS.get((dialect or "").split("+")[0].lower())
+
+
+def _is_volatile(expression) -> bool:
+    for node in expression.walk():
+        if isinstance(node, VOLATILE_EXPRESSIONS):
+            return True
+        if isinstance(node, exp.Anonymous) and node.name.upper() in VOLATILE_FUNCTIONS:
+            return True
+    return False
+
+
+def fingerprint(sql: str, dialect: str = None):
+    """
+    Canonical text of a read-only query, or None when it must not be cached
+    (writes, volatile functions, SQL that does not parse). Whitespace,
+    comments, keyword case, unquoted identifier case and quoting style are
+    normalized away by re-rendering the parsed query.
+    """
+    read = sqlglot_dialect(dialect)
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=read) if s is not None]
+    except sqlglot.errors.SqlglotError:
+        return None
+    if len(statements) != 1:
+        return None
+
+    expression = statements[0]
+    if not isinstance(expression, exp.Query) or _is_volatile(expression):
+        return None
+
+    expression = normalize_identifiers(expression, dialect=read)
+    return expression.sql(dialect=read, comments=False, normalize=True)
+
+
+def datasource_key(cfg) -> str:
+    """
+    `ds:<id>` for a request on a saved datasource (checked against its saved
+    config, see saved_datasource_config), else a key for where an ad-hoc
+    connection points.
+    """
+    if saved_datasource_config(cfg) is not None:
+        return f"ds:{int(cfg.datasource_id)}"
+    # Ad-hoc connections are keyed by where they point, never by password
+    target = f"{cfg.dialect}://{cfg.username}@{cfg.host}:{cfg.port}/{cfg.database}"
+    return "url:" + hashlib.sha256(target.encode()).hexdigest()[:32]
+
+
+def ttl_seconds(cfg) -> int:
+    """
+    The saved datasource's `result_cache_ttl` (else RESULT_CACHE_TTL_SECONDS),
+    or the request's `result_cache_ttl` when that is shorter. Ad-hoc
+    connections get 0: the cache is checked before they have connected, so a
+    hit would skip authentication.
+    """
+    saved = saved_datasource_config(cfg)
+    if saved is None:
+        return 0
+    ttl = saved.get("result_cache_ttl")
+    if not (isinstance(ttl, int) and not isinstance(ttl, bool) and ttl >= 0):
+        ttl = RESULT_CACHE_TTL_SECONDS
+    if cfg.result_cache_ttl is not None and cfg.result_cache_ttl >= 0:
+        return min(ttl, cfg.result_cache_ttl)
+    return ttl
+
+
+def _cache_key(ds_key: str, canonical_sql: str) -> str:
+    return hashlib.sha256(f"{ds_key}\n{canonical_sql}".encode()).hexdigest()
+
+
+def lookup(cfg):
+    """
+    The cached result for `cfg.sql` on its datasource, or None. A hit is only
+    returned while the entry is within its TTL (and the request's, when that
+    is shorter) and the stored result file still exists; an expired entry or
+    one whose file is gone is dropped.
+    """
+    ttl = ttl_seconds(cfg)
+    if not cfg.use_cache or ttl <= 0:
+        return None
+    canonical_sql = fingerprint(cfg.sql, cfg.dialect)
+    if canonical_sql is None:
+        stats.record("uncacheable")
+        return None
+
+    key = _cache_key(datasource_key(cfg), canonical_sql)
+    with session_scope() as session:
+        entry = session.get(ResultCache, key)
+        if entry is None:
+            stats.record("misses")
+            return None
+
+        now = datetime.now()
+        if entry.expires_at > now >= entry.created_at + timedelta(seconds=ttl):
+            # Too old for this request's TTL, but not for everyone else's
+            stats.record("misses")
+            return None
+
+        path = None
+        if entry.expires_at > now:
+            try:
+                path = result_store.get(entry.query_id)
+            except ResultNotFound:
+                pass
+        if path is None:
+            session.delete(entry)
+            session.commit()
+            stats.record("misses")
+            return None
+
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_hit_at = datetime.now()
+        session.commit()
+        stats.record("hits")
+
+        return {
+            "query_id": entry.query_id,
+            "path": path,
+            "total_rows": entry.total_rows,
+            "execution_time_ms": entry.execution_time_ms,
+            "cached_at": entry.created_at,
+        }
+
+
+def store(cfg, query_id: str, total_rows: int, execution_time_ms: int):
+    ttl = ttl_seconds(cfg)
+    if not cfg.use_cache or ttl <= 0:
+        return
+    canonical_sql = fingerprint(cfg.sql, cfg.dialect)
+    if canonical_sql is None:
+        return
+
+    ds_key = datasource_key(cfg)
+    now = datetime.now()
+    with session_scope() as session:
+        session.merge(
+            ResultCache(
+                cache_key=_cache_key(ds_key, canonical_sql),
+                data_source_key=ds_key,
+                fingerprint=canonical_sql,
+                query_id=query_id,
+                total_rows=total_rows,
+                execution_time_ms=execution_time_ms,
+                hit_count=0,
+                created_at=now,
+                expires_at=now + timedelta(seconds=ttl),
+                last_hit_at=None,
+            )
+        )
+        session.commit()
+
+
+def clear(datasource_id=None) -> int:
+    with session_scope() as session:
+        query = session.query(ResultCache)
+        if datasource_id is not None:
+            query = query.filter_by(data_source_key=f"ds:{datasource_id}")
+        removed = query.delete()
+        session.commit()
+    return removed
+
+
+def get_stats() -> dict:
+    with session_scope() as session:
+        entries = session.query(func.count(ResultCache.cache_key)).scalar()
+        # Cache hits are logged with the execution time of the run they reused
+        logged_hits, saved_ms = (
+            session.query(
+                func.count(QueryLog.id),
+                func.coalesce(func.sum(QueryLog.execution_time_ms), 0),
+            )
+            .filter(QueryLog.status == "cache_hit")
+            .one()
+        )
+
+    lookups = stats.hits + stats.misses
+    return {
+        "entries": entries,
+        "default_ttl_seconds": RESULT_CACHE_TTL_SECONDS,
+        # Since this process started
+        "hits": stats.hits,
+        "misses": stats.misses,
+        "uncacheable": stats.uncacheable,
+        "hit_rate": round(stats.hits / lookups, 4) if lookups else 0.0,
+        # All logged hits
+        "total_hits": int(logged_hits),
+        "total_saved_ms": int(saved_ms),
+    }
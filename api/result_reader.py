@@ -0,0 +1,167 @@
+import os
+import json
+import zlib
+import itertools
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+load_dotenv()  # Load from .env file
+
+# Rows encoded per chunk when exporting a stored result
+RESULT_EXPORT_BATCH_ROWS = int(os.getenv("RESULT_EXPORT_BATCH_ROWS", "10000"))
+
+
+def open_result(path: str) -> pq.ParquetFile:
+    # Memory-mapped, so only the pages a read touches are paged in
+    return pq.ParquetFile(path, memory_map=True)
+
+
+def to_dataframe(table: pa.Table):
+    """
+    `table` as pandas, with decimal columns as doubles: Decimal objects are
+    slow for pandas to aggregate and plotting libraries don't take them.
+    """
+    schema = pa.schema(
+        [
+            field.with_type(pa.float64()) if pa.types.is_decimal(field.type) else field
+            for field in table.schema
+        ]
+    )
+    return table.cast(schema).to_pandas()
+
+
+def _check_columns(parquet_file: pq.ParquetFile, columns):
+    if not columns:
+        return None
+    available = parquet_file.schema_arrow.names
+    unknown = [name for name in columns if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return list(columns)
+
+
+def read_page(path: str, offset: int = 0, limit: int = None, columns=None) -> dict:
+    """
+    Rows `offset` to `offset + limit` of a stored result, decoding only the
+    row groups that overlap that range and only the requested columns. Row
+    group boundaries come from the parquet footer, so a page costs the same
+    at the end of a large result as at the start.
+    """
+    parquet_file = open_result(path)
+    columns = _check_columns(parquet_file, columns)
+    metadata = parquet_file.metadata
+    total_rows = metadata.num_rows
+
+    offset = max(0, offset)
+    end = total_rows if limit is None else min(total_rows, offset + max(0, limit))
+
+    groups, first_group_start, start = [], None, 0
+    for i in range(metadata.num_row_groups):
+        group_rows = metadata.row_group(i).num_rows
+        if start < end and start + group_rows > offset:
+            if first_group_start is None:
+                first_group_start = start
+            groups.append(i)
+        start += group_rows
+
+    if groups:
+        table = parquet_file.read_row_groups(groups, columns=columns)
+        table = table.slice(offset - first_group_start, end - offset)
+    else:
+        schema = parquet_file.schema_arrow
+        if columns:
+            schema = pa.schema([schema.field(name) for name in columns])
+        table = schema.empty_table()
+
+    return {
+        "columns": table.column_names,
+        "data": table.to_pylist(),
+        "offset": offset,
+        "limit": limit,
+        "rows": table.num_rows,
+        "total_rows": total_rows,
+    }
+
+
+def read_head(path: str, rows: int) -> pa.Table:
+    """The first `rows` rows, decoding only the row group(s) they are in."""
+    parquet_file = open_result(path)
+    batches = parquet_file.iter_batches(batch_size=rows)
+    return pa.Table.from_batches(
+        itertools.islice(batches, 1), schema=parquet_file.schema_arrow
+    )
+
+
+def iter_batches(path: str, columns=None, batch_size: int = RESULT_EXPORT_BATCH_ROWS):
+    parquet_file = open_result(path)
+    columns = _check_columns(parquet_file, columns)
+    return parquet_file.schema_arrow, parquet_file.iter_batches(
+        batch_size=batch_size, columns=columns
+    )
+
+
+def _csv_chunk(table, include_header: bool) -> bytes:
+    sink = pa.BufferOutputStream()
+    pa_csv.write_csv(
+        table, sink, write_options=pa_csv.WriteOptions(include_header=include_header)
+    )
+    return sink.getvalue().to_pybytes()
+
+
+def iter_csv(path: str, columns=None):
+    """CSV bytes one record batch at a time; the header goes out first."""
+    schema, batches = iter_batches(path, columns)
+    if columns:
+        schema = pa.schema([schema.field(name) for name in columns])
+    yield _csv_chunk(schema.empty_table(), include_header=True)
+    for batch in batches:
+        yield _csv_chunk(pa.Table.from_batches([batch]), include_header=False)
+
+
+# End-of-stream marker of the Arrow IPC streaming format
+ARROW_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+def iter_arrow(path: str, columns=None):
+    """
+    An Arrow IPC stream (schema message, one message per record batch, end
+    marker), readable with `pyarrow.ipc.open_stream` or Polars as typed
+    columns. Batches are serialized as-is, without converting values.
+    """
+    schema, batches = iter_batches(path, columns)
+    if columns:
+        schema = pa.schema([schema.field(name) for name in columns])
+    yield schema.serialize().to_pybytes()
+    for batch in batches:
+        yield batch.serialize().to_pybytes()
+    yield ARROW_EOS
+
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_ndjson(path: str, columns=None):
+    """One JSON object per row, encoded one record batch at a time."""
+    _, batches = iter_batches(path, columns)
+    for batch in batches:
+        yield "".join(
+            json.dumps(row, default=_json_default) + "\n" for row in batch.to_pylist()
+        ).encode()
+
+
+def gzip_chunks(chunks):
+    """
+    Gzip-compresses a byte stream on the fly. Each chunk is sync-flushed so
+    the client receives it (the CSV header first of all) without waiting for
+    the compressor to fill its window.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip framing
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import time
+import threading
+
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+load_dotenv()  # Load from .env file
+
+RESULT_STORE_DIR = os.getenv("RESULT_STORE_DIR", "/tmp/askbi-results")
+RESULT_STORE_MAX_BYTES = int(
+    os.getenv("RESULT_STORE_MAX_BYTES", str(2 * 1024 * 1024 * 1024))
+)
+RESULT_STORE_TTL_SECONDS = int(os.getenv("RESULT_STORE_TTL_SECONDS", "86400"))
+
+INDEX_FILE = "index.json"
+RESULT_SUFFIX = ".parquet"
+STAGING_SUFFIX = ".parquet.partial"
+# Index writes for access-time updates alone are batched to this interval
+INDEX_FLUSH_SECONDS = 30
+
+QUERY_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class ResultNotFound(Exception):
+    pass
+
+
+class ResultStore:
+    """
+    Parquet query results under one root directory, with an index.json of
+    entry metadata (rows, schema, size, created and last-access time).
+
+    Results are written to a staging file and only become visible once
+    `commit` moves them into place. Entries expire `ttl_seconds` after they
+    were created, and when the store grows past `max_bytes` the least
+    recently read entries are deleted first.
+    """
+
+    def __init__(
+        self,
+        root: str = RESULT_STORE_DIR,
+        max_bytes: int = RESULT_STORE_MAX_BYTES,
+        ttl_seconds: int = RESULT_STORE_TTL_SECONDS,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty_since = None
+        self.evictions = 0
+        self.expirations = 0
+
+    # --- Paths ---
+
+    def _check_id(self, query_id: str) -> str:
+        if not QUERY_ID_PATTERN.fullmatch(query_id or ""):
+            raise ValueError(f"Invalid query id: {query_id!r}")
+        return query_id
+
+    def _result_path(self, query_id: str) -> str:
+        return os.path.join(self.root, self._check_id(query_id) + RESULT_SUFFIX)
+
+    def staging_path(self, query_id: str) -> str:
+        """Where a new result is written before `commit`."""
+        self._ensure_loaded()
+        return os.path.join(self.root, self._check_id(query_id) + STAGING_SUFFIX)
+
+    # --- Index ---
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            try:
+                with open(os.path.join(self.root, INDEX_FILE)) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = {}
+
+            # Keep only entries whose file survived; adopt files the index lost
+            on_disk = {
+                name[: -len(RESULT_SUFFIX)]
+                for name in os.listdir(self.root)
+                if name.endswith(RESULT_SUFFIX)
+            }
+            self._entries = {k: v for k, v in entries.items() if k in on_disk}
+            for query_id in on_disk - set(self._entries):
+                try:
+                    self._entries[query_id] = self._describe(query_id)
+                except Exception as e:
+                    print(f"Result store: skipping unreadable {query_id}: {e}")
+            self._loaded = True
+            self._save_index()
+
+    def _save_index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, path)
+        self._dirty_since = None
+
+    def _describe(self, query_id: str, now: float = None) -> dict:
+        path = self._result_path(query_id)
+        metadata = pq.read_metadata(path)
+        schema = metadata.schema.to_arrow_schema()
+        created_at = os.path.getmtime(path) if now is None else now
+        return {
+            "rows": metadata.num_rows,
+            "columns": [
+                {"name": field.name, "type": str(field.type)} for field in schema
+            ],
+            "bytes": os.path.getsize(path),
+            "created_at": created_at,
+            "last_access": created_at,
+        }
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return now - entry["created_at"] > self.ttl_seconds
+
+    def _delete(self, query_id: str):
+        self._entries.pop(query_id, None)
+        try:
+            os.remove(self._result_path(query_id))
+        except FileNotFoundError:
+            pass
+
+    def _enforce_limits(self, now: float, keep: str = None) -> tuple[int, int]:
+        expired = [k for k, v in self._entries.items() if self._expired(v, now)]
+        for query_id in expired:
+            self._delete(query_id)
+        self.expirations += len(expired)
+
+        evicted = 0
+        total = sum(entry["bytes"] for entry in self._entries.values())
+        if total > self.max_bytes:
+            # The result just written is kept even if it alone is over quota
+            for query_id in sorted(
+                self._entries, key=lambda k: self._entries[k]["last_access"]
+            ):
+                if total <= self.max_bytes:
+                    break
+                if query_id == keep:
+                    continue
+                total -= self._entries[query_id]["bytes"]
+                self._delete(query_id)
+                evicted += 1
+        self.evictions += evicted
+        return len(expired), evicted
+
+    # --- Public API ---
+
+    def commit(self, query_id: str) -> dict:
+        """Publishes a fully written staging file and records its metadata."""
+        staging = self.staging_path(query_id)
+        now = time.time()
+        with self._lock:
+            os.replace(staging, self._result_path(query_id))
+            entry = self._describe(query_id, now)
+            self._entries[query_id] = entry
+            self._enforce_limits(now, keep=query_id)
+            self._save_index()
+        return dict(entry)
+
+    def discard(self, query_id: str):
+        """Removes a staging file left by a failed or abandoned write."""
+        try:
+            os.remove(self.staging_path(query_id))
+        except FileNotFoundError:
+            pass
+
+    def get(self, query_id: str) -> str:
+        """Path of a stored result, refreshing its LRU position."""
+        self._ensure_loaded()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(query_id)
+            exists = os.path.exists(self._result_path(query_id))
+            if entry is None and exists:
+                # Committed by another worker process since the index was read
+                try:
+                    entry = self._entries[query_id] = self._describe(query_id)
+                except (OSError, ValueError):
+                    entry = None
+            if entry is None or not exists:
+                self._entries.pop(query_id, None)
+                raise ResultNotFound(query_id)
+            if self._expired(entry, now):
+                self._delete(query_id)
+                self.expirations += 1
+                self._save_index()
+                raise ResultNotFound(query_id)
+
+            entry["last_access"] = now
+            if self._dirty_since is None:
+                self._dirty_since = now
+            elif now - self._dirty_since > INDEX_FLUSH_SECONDS:
+                self._save_index()
+            return self._result_path(query_id)
+
+    def entry(self, query_id: str) -> dict:
+        self.get(query_id)
+        with self._lock:
+            return dict(self._entries[query_id])
+
+    def query_ids(self) -> list[str]:
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._entries)
+
+    def delete(self, query_id: str) -> bool:
+        self._ensure_loaded()
+        with self._lock:
+            found = query_id in self._entries
+            self._delete(query_id)
+            self._save_index()
+        return found
+
+    def cleanup(self) -> dict:
+        """Drops expired entries and stray staging files, then applies the quota."""
+        self._ensure_loaded()
+        now = time.time()
+        stale_staging = 0
+        with self._lock:
+            expired, evicted = self._enforce_limits(now)
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if name.endswith(STAGING_SUFFIX) and (
+                    now - os.path.getmtime(path) > self.ttl_seconds
+                ):
+                    os.remove(path)
+                    stale_staging += 1
+            self._save_index()
+        return {
+            "expired": expired,
+            "evicted": evicted,
+            "stale_staging_files": stale_staging,
+        }
+
+    def stats(self) -> dict:
+        self._ensure_loaded()
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "root": self.root,
+            "entries": len(entries),
+            "bytes": sum(entry["bytes"] for entry in entries),
+            "max_bytes": self.max_bytes,
+            "rows": sum(entry["rows"] for entry in entries),
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+result_store = ResultStore()
@@ -0,0 +1,169 @@
+import os
+
+import sqlglot
+from sqlglot import exp
+from dotenv import load_dotenv
+
+from db_models import QueryLog
+from metadata_store import session_scope
+from result_cache import sqlglot_dialect
+from result_store import result_store, ResultNotFound
+from file_engine import FileEngine
+
+load_dotenv()  # Load from .env file
+
+RESULT_TABLE_PREFIX = "result_"
+# Earlier results of a chat offered to the SQL generator, most recent kept
+CHAT_RESULT_TABLES = int(os.getenv("CHAT_RESULT_TABLES", "3"))
+
+
+class ResultTableError(ValueError):
+    """SQL that mixes stored results with datasource tables."""
+
+
+class ResultEngine(FileEngine):
+    """A FileEngine over stored results, built for one query and closed after it."""
+
+
+def table_name(query_id: str) -> str:
+    return RESULT_TABLE_PREFIX + query_id.lower().replace("-", "_")
+
+
+def _stored_path(query_id: str):
+    try:
+        return result_store.get(query_id)
+    except (ResultNotFound, ValueError):
+        return None
+
+
+def resolve(name: str):
+    """`(query_id, path)` of the stored result a table name refers to, or None."""
+    name = name.lower()
+    if not name.startswith(RESULT_TABLE_PREFIX):
+        return None
+    query_id = name[len(RESULT_TABLE_PREFIX) :]
+    path = _stored_path(query_id)
+    if path is not None:
+        return query_id, path
+    # Client-chosen ids may have capitals or hyphens the table name lost
+    for query_id in result_store.query_ids():
+        if table_name(query_id) == name:
+            path = _stored_path(query_id)
+            return (query_id, path) if path is not None else None
+    return None
+
+
+def source_name(table: exp.Table, dialect: str = None) -> str:
+    """
+    A table's lower-cased name, or the call itself for table functions
+    such as read_csv('...'), which have no name.
+    """
+    if table.name:
+        return table.name.lower()
+    return (table.this or table).sql(dialect=sqlglot_dialect(dialect))
+
+
+def expression_tables(expression: exp.Expression, dialect: str = None) -> set:
+    """source_name of every table a parsed query reads, CTEs excluded."""
+    ctes = {cte.alias.lower() for cte in expression.find_all(exp.CTE)}
+    return {
+        source_name(table, dialect)
+        for table in expression.find_all(exp.Table)
+        if table.name.lower() not in ctes
+    }
+
+
+def referenced_tables(sql: str, dialect: str = None) -> set:
+    """Names of the tables `sql` reads, CTEs excluded (see source_name)."""
+    try:
+        expression = sqlglot.parse_one(sql, read=sqlglot_dialect(dialect))
+    except sqlglot.errors.SqlglotError:
+        return set()
+    return expression_tables(expression, dialect)
+
+
+def local_sources(sql: str, dialect: str = None):
+    """
+    FileEngine sources for the stored results `sql` reads when it reads
+    nothing else, else None. Raises ResultTableError if it joins stored
+    results with datasource tables.
+    """
+    if RESULT_TABLE_PREFIX not in (sql or "").lower():
+        return None
+    sources, others = {}, []
+    for name in referenced_tables(sql, dialect):
+        resolved = resolve(name)
+        if resolved is None:
+            others.append(name)
+        else:
+            sources[name] = {"paths": [resolved[1]], "file_type": "parquet"}
+    if not sources:
+        return None
+    if others:
+        raise ResultTableError(
+            "Earlier results can't be joined with other tables or files "
+            f"({', '.join(sorted(others))}); query one or the other"
+        )
+    return sources
+
+
+def session_tables(query_ids) -> list[dict]:
+    """
+    The still-stored results among a chat's `query_ids` (oldest first), the
+    last CHAT_RESULT_TABLES of them, with columns, row count and the SQL
+    that produced each.
+    """
+    tables = {}
+    for query_id in query_ids or []:
+        try:
+            entry = result_store.entry(query_id)
+        except (ResultNotFound, ValueError):
+            continue
+        tables.pop(query_id, None)  # a repeat moves to the end
+        tables[query_id] = {
+            "table_name": table_name(query_id),
+            "query_id": query_id,
+            "rows": entry["rows"],
+            "columns": entry["columns"],
+        }
+    tables = list(tables.values())[-CHAT_RESULT_TABLES:] if CHAT_RESULT_TABLES else []
+
+    with session_scope() as session:
+        logged = dict(
+            session.query(QueryLog.query_id, QueryLog.sql_query)
+            .filter(QueryLog.query_id.in_([t["query_id"] for t in tables]))
+            .all()
+        )
+    for table in tables:
+        table["sql"] = logged.get(table["query_id"])
+    return tables
+
+
+def table_columns(tables: list[dict]) -> dict:
+    """Table name -> set of lower-cased column names, for sql_validator."""
+    return {
+        table["table_name"]: {col["name"].lower() for col in table["columns"]}
+        for table in tables
+    }
+
+
+def describe(tables: list[dict]) -> str:
+    """Markdown for the SQL prompt, in the shape of generate_llm_schema."""
+    if not tables:
+        return ""
+    lines = [
+        "# Earlier results in this chat",
+        "Tables named result_<id> hold results of earlier queries in this chat and "
+        "are queried locally in milliseconds. When the question refines or breaks "
+        "down an earlier result, select from its result table instead of the "
+        "source tables. Never join a result table with other tables.",
+        "",
+    ]
+    for table in tables:
+        lines.append(f"# Table: {table['table_name']} ({table['rows']} rows)")
+        if table.get("sql"):
+            lines.append(f"Produced by: {' '.join(table['sql'].split())}")
+        for col in table["columns"]:
+            lines.append(f"- {col['name']} ({col['type']})")
+        lines.append("")
+    return "\n".join(lines).strip()
@@ -0,0 +1,108 @@
+import os
+import time
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()  # Load from .env file
+
+SCHEMA_CACHE_TTL_SECONDS = int(os.getenv("SCHEMA_CACHE_TTL_SECONDS", "3600"))
+
+
+class ReflectionCache:
+    """
+    In-process cache of reflected table structure keyed by (datasource, table).
+
+    Each entry holds what the Inspector returned for one table, already reduced
+    to plain data:
+        {
+            "columns": [{"name": "id", "type": "INTEGER"}, ...],
+            "primary_key": ["id"],
+            "foreign_keys": {"customer_id": {"referred_table": ..., "referred_column": ...}},
+        }
+    Table name listings are cached per datasource as well, so a warm `"all"`
+    request does not touch the catalog either.
+    """
+
+    def __init__(self, ttl_seconds: int = SCHEMA_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._tables: dict[tuple[str, str], tuple[float, dict]] = {}
+        self._table_names: dict[str, tuple[float, list[str]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, datasource_id, table_name: str):
+        key = (str(datasource_id), table_name)
+        with self._lock:
+            entry = self._tables.get(key)
+            if entry is None or entry[0] < time.time():
+                self._tables.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def put(self, datasource_id, table_name: str, info: dict):
+        with self._lock:
+            self._tables[(str(datasource_id), table_name)] = (
+                time.time() + self.ttl_seconds,
+                info,
+            )
+
+    def get_table_names(self, datasource_id):
+        key = str(datasource_id)
+        with self._lock:
+            entry = self._table_names.get(key)
+            if entry is None or entry[0] < time.time():
+                self._table_names.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(entry[1])
+
+    def put_table_names(self, datasource_id, table_names: list[str]):
+        with self._lock:
+            self._table_names[str(datasource_id)] = (
+                time.time() + self.ttl_seconds,
+                list(table_names),
+            )
+
+    def invalidate(self, datasource_id=None, tables=None) -> int:
+        """
+        Drop cached entries. With no arguments everything goes; with only a
+        datasource, all of its tables and its table listing go.
+        """
+        with self._lock:
+            if datasource_id is None:
+                removed = len(self._tables)
+                self._tables.clear()
+                self._table_names.clear()
+                return removed
+
+            ds = str(datasource_id)
+            keys = [
+                key
+                for key in self._tables
+                if key[0] == ds and (tables is None or key[1] in tables)
+            ]
+            for key in keys:
+                del self._tables[key]
+            if tables is None:
+                self._table_names.pop(ds, None)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._tables),
+                "datasources": len({key[0] for key in self._tables}),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+reflection_cache = ReflectionCache()
@@ -0,0 +1,430 @@
+import re
+
+from sqlalchemy import text, bindparam, inspect
+from sqlalchemy.dialects.postgresql import ARRAY
+
+# Bulk catalog queries per dialect. Each dialect needs one query for columns and
+# one (two on Snowflake) for primary/foreign keys, regardless of table count.
+# Results use the same shape as reflect_table below:
+#     {table: {"columns": [...], "primary_key": [...], "foreign_keys": {...}}}
+# Like Inspector.get_table_names, they cover base tables only, not views.
+
+POSTGRES_COLUMNS = """
+    SELECT c.relname AS table_name,
+           a.attname AS column_name,
+           format_type(a.atttypid, a.atttypmod) AS data_type
+    FROM pg_catalog.pg_attribute a
+    JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = current_schema()
+      AND c.relkind IN ('r', 'p')
+      AND a.attnum > 0
+      AND NOT a.attisdropped
+      {table_filter}
+    ORDER BY c.relname, a.attnum
+"""
+
+POSTGRES_KEYS = """
+    SELECT c.relname AS table_name,
+           con.contype AS constraint_type,
+           con.conname AS constraint_name,
+           a.attname AS column_name,
+           rc.relname AS referred_table,
+           ra.attname AS referred_column,
+           k.ord AS position
+    FROM pg_catalog.pg_constraint con
+    JOIN pg_catalog.pg_class c ON c.oid = con.conrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    CROSS JOIN LATERAL unnest(con.conkey, coalesce(con.confkey, con.conkey))
+        WITH ORDINALITY AS k(attnum, refattnum, ord)
+    JOIN pg_catalog.pg_attribute a
+        ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+    LEFT JOIN pg_catalog.pg_class rc ON rc.oid = con.confrelid
+    LEFT JOIN pg_catalog.pg_attribute ra
+        ON ra.attrelid = con.confrelid AND ra.attnum = k.refattnum
+    WHERE n.nspname = current_schema()
+      AND con.contype IN ('p', 'f')
+      {table_filter}
+    ORDER BY c.relname, con.conname, k.ord
+"""
+
+MYSQL_COLUMNS = """
+    SELECT TABLE_NAME AS table_name,
+           COLUMN_NAME AS column_name,
+           COLUMN_TYPE AS data_type
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE()
+      AND TABLE_NAME IN (
+          SELECT TABLE_NAME FROM information_schema.TABLES
+          WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+      )
+      {table_filter}
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+"""
+
+MYSQL_KEYS = """
+    SELECT TABLE_NAME AS table_name,
+           CASE WHEN CONSTRAINT_NAME = 'PRIMARY' THEN 'p' ELSE 'f' END
+               AS constraint_type,
+           CONSTRAINT_NAME AS constraint_name,
+           COLUMN_NAME AS column_name,
+           REFERENCED_TABLE_NAME AS referred_table,
+           REFERENCED_COLUMN_NAME AS referred_column,
+           ORDINAL_POSITION AS position
+    FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = DATABASE()
+      AND (CONSTRAINT_NAME = 'PRIMARY' OR REFERENCED_TABLE_NAME IS NOT NULL)
+      {table_filter}
+    ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+"""
+
+SQLITE_COLUMNS = """
+    SELECT m.name AS table_name,
+           p.name AS column_name,
+           p.type AS data_type,
+           p.pk AS pk_position
+    FROM sqlite_master m
+    JOIN pragma_table_info(m.name) p
+    WHERE m.type = 'table'
+      AND m.name NOT LIKE 'sqlite_%'
+      {table_filter}
+    ORDER BY m.name, p.cid
+"""
+
+SQLITE_FOREIGN_KEYS = """
+    SELECT m.name AS table_name,
+           'f' AS constraint_type,
+           f.id AS constraint_name,
+           f."from" AS column_name,
+           f."table" AS referred_table,
+           f."to" AS referred_column,
+           f.seq + 1 AS position
+    FROM sqlite_master m
+    JOIN pragma_foreign_key_list(m.name) f
+    WHERE m.type = 'table'
+      {table_filter}
+    ORDER BY m.name, f.id, f.seq
+"""
+
+SNOWFLAKE_COLUMNS = """
+    SELECT table_name,
+           column_name,
+           CASE
+               WHEN data_type = 'NUMBER'
+                   THEN 'NUMBER(' || numeric_precision || ', ' || numeric_scale || ')'
+               WHEN data_type = 'TEXT' AND character_maximum_length IS NOT NULL
+                   THEN 'VARCHAR(' || character_maximum_length || ')'
+               ELSE data_type
+           END AS data_type
+    FROM information_schema.columns
+    WHERE table_schema = CURRENT_SCHEMA()
+      AND table_name IN (
+          SELECT table_name FROM information_schema.tables
+          WHERE table_schema = CURRENT_SCHEMA() AND table_type = 'BASE TABLE'
+      )
+      {table_filter}
+    ORDER BY table_name, ordinal_position
+"""
+
+
+TYPE_ARGS_PATTERN = re.compile(r"\((.*)\)")
+TYPE_ARGS_DELIMITER = re.compile(r"\s*,\s*")
+ARRAY_SPEC_PATTERN = re.compile(r"((?:\[\])*)$")
+MYSQL_TYPE_PATTERN = re.compile(r"^(\w+)(?:\((.*)\))?\s*(.*)$")
+
+
+def _postgres_type(dialect, format_type: str):
+    """The type PGDialect reflects for a format_type() string."""
+    match = TYPE_ARGS_PATTERN.search(format_type)
+    type_args = TYPE_ARGS_DELIMITER.split(match.group(1)) if match else []
+    array = ARRAY_SPEC_PATTERN.search(format_type).group(1)
+    name = ARRAY_SPEC_PATTERN.sub("", TYPE_ARGS_PATTERN.sub("", format_type))
+
+    kind = dialect.ischema_names.get(name.lower())
+    args, kwargs = (), {}
+    if name.startswith("interval"):
+        kind = dialect.ischema_names["interval"]
+        if name != "interval":
+            kwargs["fields"] = name[len("interval ") :]
+        if len(type_args) == 1:
+            kwargs["precision"] = int(type_args[0])
+    elif kind is None:
+        raise LookupError(name)  # enums and domains
+    elif name == "numeric":
+        args = tuple(map(int, type_args)) if len(type_args) == 2 else ()
+    elif name == "double precision":
+        args = (53,)
+    elif name == "integer":
+        pass
+    elif name.endswith("time zone") or name == "time":
+        kwargs["timezone"] = name.endswith("with time zone")
+        if len(type_args) == 1:
+            kwargs["precision"] = int(type_args[0])
+    elif name == "bit varying":
+        kwargs["varying"] = True
+        args = (int(type_args[0]),) if len(type_args) == 1 else ()
+    elif type_args:
+        args = (int(type_args[0]), *type_args[1:])
+
+    type_ = kind(*args, **kwargs)
+    return ARRAY(type_) if array else type_
+
+
+def _mysql_type(dialect, column_type: str):
+    """The type MySQLDialect reflects for an information_schema COLUMN_TYPE."""
+    name, type_args, flags = MYSQL_TYPE_PATTERN.match(column_type).groups()
+    kind = dialect.ischema_names[name.lower()]
+    if name.lower() in ("enum", "set"):
+        values = re.findall(r"'((?:[^']|'')*)'", type_args or "")
+        return kind(*[v.replace("''", "'") for v in values])
+    args = [int(a) for a in TYPE_ARGS_DELIMITER.split(type_args)] if type_args else []
+    kwargs = {flag: True for flag in ("unsigned", "zerofill") if flag in flags}
+    if args and name.lower() in ("tinyint", "smallint", "mediumint", "int", "bigint"):
+        kwargs["display_width"] = args.pop()
+    return kind(*args, **kwargs)
+
+
+def _render_type(dialect, data_type: str) -> str:
+    """
+    `str()` of the type the SQLAlchemy Inspector would reflect for a catalog
+    type name, so bulk and Inspector reflection produce the same schema text
+    (and so the same schema hashes). Types the dialect doesn't map, such as
+    Postgres enums and domains, keep the catalog spelling.
+    """
+    try:
+        if dialect.name == "postgresql":
+            return str(_postgres_type(dialect, data_type))
+        if dialect.name in ("mysql", "mariadb"):
+            return str(_mysql_type(dialect, data_type))
+        if dialect.name == "sqlite":
+            return str(dialect._resolve_type_affinity(data_type.upper()))
+    except (LookupError, TypeError, ValueError, AttributeError):
+        pass
+    return data_type.upper()
+
+
+def _table_filter(column: str, table_names) -> str:
+    return f"AND {column} IN :tables" if table_names else ""
+
+
+def _execute(conn, sql: str, table_names):
+    query = text(sql)
+    params = {}
+    if table_names:
+        query = query.bindparams(bindparam("tables", expanding=True))
+        params["tables"] = list(table_names)
+    return conn.execute(query, params).mappings().all()
+
+
+def _assemble(column_rows, key_rows, dialect, normalize=lambda name: name) -> dict:
+    reflected = {}
+    for row in column_rows:
+        table = reflected.setdefault(
+            normalize(row["table_name"]),
+            {"columns": [], "primary_key": [], "foreign_keys": {}},
+        )
+        table["columns"].append(
+            {
+                "name": normalize(row["column_name"]),
+                "type": _render_type(dialect, row["data_type"]),
+            }
+        )
+
+    for row in key_rows:
+        table = reflected.get(normalize(row["table_name"]))
+        if table is None:
+            continue
+        column = normalize(row["column_name"])
+        if row["constraint_type"] == "p":
+            table["primary_key"].append(column)
+        elif int(row["position"]) == 1 and row["referred_table"]:
+            # Same convention as the Inspector path: first column of each FK
+            table["foreign_keys"][column] = {
+                "referred_table": normalize(row["referred_table"]),
+                "referred_column": (
+                    normalize(row["referred_column"])
+                    if row["referred_column"]
+                    else None
+                ),
+            }
+
+    # SQLite leaves "to" empty when a FK targets the referred table's PK
+    for table in reflected.values():
+        for fk in table["foreign_keys"].values():
+            if fk["referred_column"] is None:
+                referred = reflected.get(fk["referred_table"], {})
+                pk = referred.get("primary_key") or ["rowid"]
+                fk["referred_column"] = pk[0]
+
+    return reflected
+
+
+def _reflect_postgresql(conn, table_names):
+    columns = _execute(
+        conn,
+        POSTGRES_COLUMNS.format(table_filter=_table_filter("c.relname", table_names)),
+        table_names,
+    )
+    keys = _execute(
+        conn,
+        POSTGRES_KEYS.format(table_filter=_table_filter("c.relname", table_names)),
+        table_names,
+    )
+    return _assemble(columns, keys, conn.dialect)
+
+
+def _reflect_mysql(conn, table_names):
+    columns = _execute(
+        conn,
+        MYSQL_COLUMNS.format(table_filter=_table_filter("TABLE_NAME", table_names)),
+        table_names,
+    )
+    keys = _execute(
+        conn,
+        MYSQL_KEYS.format(table_filter=_table_filter("TABLE_NAME", table_names)),
+        table_names,
+    )
+    return _assemble(columns, keys, conn.dialect)
+
+
+def _reflect_sqlite(conn, table_names):
+    columns = _execute(
+        conn,
+        SQLITE_COLUMNS.format(table_filter=_table_filter("m.name", table_names)),
+        table_names,
+    )
+    keys = [
+        {
+            "table_name": row["table_name"],
+            "constraint_type": "p",
+            "column_name": row["column_name"],
+            "position": row["pk_position"],
+        }
+        for row in sorted(columns, key=lambda r: r["pk_position"])
+        if row["pk_position"]
+    ]
+    keys += _execute(
+        conn,
+        SQLITE_FOREIGN_KEYS.format(table_filter=_table_filter("m.name", table_names)),
+        table_names,
+    )
+    return _assemble(columns, keys, conn.dialect)
+
+
+def _reflect_snowflake(conn, table_names):
+    dialect = conn.dialect
+    raw_names = [dialect.denormalize_name(t) for t in table_names or []]
+    columns = _execute(
+        conn,
+        SNOWFLAKE_COLUMNS.format(table_filter=_table_filter("table_name", raw_names)),
+        raw_names,
+    )
+
+    # SHOW commands cover the whole schema in one round trip each
+    keys = []
+    for row in conn.execute(text("SHOW PRIMARY KEYS IN SCHEMA")).mappings():
+        keys.append(
+            {
+                "table_name": row["table_name"],
+                "constraint_type": "p",
+                "column_name": row["column_name"],
+                "position": row["key_sequence"],
+            }
+        )
+    for row in conn.execute(text("SHOW IMPORTED KEYS IN SCHEMA")).mappings():
+        keys.append(
+            {
+                "table_name": row["fk_table_name"],
+                "constraint_type": "f",
+                "column_name": row["fk_column_name"],
+                "referred_table": row["pk_table_name"],
+                "referred_column": row["pk_column_name"],
+                "position": row["key_sequence"],
+            }
+        )
+    keys.sort(key=lambda r: int(r["position"]))
+    return _assemble(columns, keys, dialect, normalize=dialect.normalize_name)
+
+
+BULK_REFLECTORS = {
+    "postgresql": _reflect_postgresql,
+    "mysql": _reflect_mysql,
+    "mariadb": _reflect_mysql,
+    "sqlite": _reflect_sqlite,
+    "snowflake": _reflect_snowflake,
+}
+
+
+def reflect_table(inspector, table_name: str) -> dict:
+    columns = inspector.get_columns(table_name)
+    pk_columns = inspector.get_pk_constraint(table_name).get("constrained_columns", [])
+    foreign_keys = {
+        fk["constrained_columns"][0]: {
+            "referred_table": fk["referred_table"],
+            "referred_column": fk["referred_columns"][0],
+        }
+        for fk in inspector.get_foreign_keys(table_name)
+        if fk.get("constrained_columns") and fk.get("referred_columns")
+    }
+    return {
+        "columns": [{"name": col["name"], "type": str(col["type"])} for col in columns],
+        "primary_key": list(pk_columns or []),
+        "foreign_keys": foreign_keys,
+    }
+
+
+def _reflect_with_inspector(engine, table_names):
+    inspector = inspect(engine)
+    if table_names is None:
+        table_names = inspector.get_table_names()
+
+    try:
+        # SQLAlchemy 2.x batches these per dialect where it can
+        filter_names = list(table_names)
+        multi_columns = inspector.get_multi_columns(filter_names=filter_names)
+        multi_pks = inspector.get_multi_pk_constraint(filter_names=filter_names)
+        multi_fks = inspector.get_multi_foreign_keys(filter_names=filter_names)
+    except (AttributeError, NotImplementedError):
+        return {name: reflect_table(inspector, name) for name in table_names}
+
+    reflected = {}
+    for (_, name), columns in multi_columns.items():
+        pk = multi_pks.get((None, name)) or {}
+        fks = multi_fks.get((None, name)) or []
+        reflected[name] = {
+            "columns": [{"name": c["name"], "type": str(c["type"])} for c in columns],
+            "primary_key": list(pk.get("constrained_columns") or []),
+            "foreign_keys": {
+                fk["constrained_columns"][0]: {
+                    "referred_table": fk["referred_table"],
+                    "referred_column": fk["referred_columns"][0],
+                }
+                for fk in fks
+                if fk.get("constrained_columns") and fk.get("referred_columns")
+            },
+        }
+    return reflected
+
+
+def bulk_reflect(engine, table_names=None) -> dict:
+    """
+    Columns, primary keys and foreign keys for many tables in a handful of
+    catalog queries. `table_names=None` reflects every table in the default
+    schema. Tables that do not exist are simply absent from the result.
+    Dialects without a bulk query, or a bulk query that fails (permissions,
+    older server), fall back to the SQLAlchemy Inspector.
+    """
+    if table_names is not None:
+        table_names = list(table_names)
+        if not table_names:
+            return {}
+
+    reflector = BULK_REFLECTORS.get(engine.dialect.name)
+    if reflector is not None:
+        try:
+            with engine.connect() as conn:
+                return reflector(conn, table_names)
+        except Exception as e:
+            print(f"Bulk reflection failed on {engine.dialect.name}: {e}")
+
+    return _reflect_with_inspector(engine, table_names)
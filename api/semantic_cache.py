@@ -0,0 +1,381 @@
+import os
+import re
+import time
+import zlib
+import threading
+from datetime import datetime
+
+import numpy as np
+from dotenv import load_dotenv
+
+from db_models import GeneratedSqlCache
+from metadata_store import session_scope
+from table_index import tokenize
+import sql_cache
+
+load_dotenv()  # Load from .env file
+
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "256"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8"))
+SEMANTIC_CACHE_TOP_K = int(os.getenv("SEMANTIC_CACHE_TOP_K", "5"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100000"))
+SEMANTIC_CACHE_MAX_BYTES = int(
+    os.getenv("SEMANTIC_CACHE_MAX_BYTES", str(128 * 1024 * 1024))
+)
+# Words one question may have that the other lacks and still reuse its SQL
+SEMANTIC_CACHE_MAX_EXTRA_WORDS = int(os.getenv("SEMANTIC_CACHE_MAX_EXTRA_WORDS", "1"))
+
+WORD_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.5
+
+
+# Spellings folded to one token before embedding and comparing questions
+# fmt: off
+SYNONYMS = {
+    "best": "top", "highest": "top", "greatest": "top", "largest": "top",
+    "biggest": "top", "worst": "bottom", "lowest": "bottom", "smallest": "bottom",
+    "least": "bottom", "previous": "last", "prior": "last", "past": "last",
+    "upcoming": "next", "seller": "sell", "selling": "sell", "sold": "sell",
+    "sale": "sell", "client": "customer", "earning": "revenue", "total": "sum",
+    "average": "avg", "mean": "avg", "number": "count", "maximum": "max",
+    "minimum": "min", "unique": "distinct", "percentage": "percent",
+    "over": "more", "above": "more", "greater": "more", "exceeding": "more",
+    "under": "less", "below": "less", "fewer": "less",
+}
+# Tokens that change what SQL answers a question; two questions only share
+# SQL when these match exactly and in the same order
+GUARD_WORDS = {
+    "top", "bottom", "first", "last", "next", "sum", "avg", "count", "max", "min",
+    "median", "distinct", "percent", "more", "less", "before", "after",
+    "between", "since", "until", "ascending", "descending",
+}
+# fmt: on
+NEGATION_PATTERN = re.compile(
+    r"\b(?:not|no|none|nor|never|non|without|exclud\w*|except\w*)\b|n't\b"
+)
+LITERAL_PATTERN = re.compile(r"'[^']*'|\"[^\"]*\"|\d+(?:[.,]\d+)*")
+# Stopwords that still decide grouping, filters or direction: "to X from Y"
+# is not "from X to Y", and "by month and region" is not "by month"
+RELATION_PATTERN = re.compile(r"\b(?:by|per|and|or|from|to|into|in|on|at|for|with)\b")
+
+
+# SYNONYMS keyed the way tokenize() spells words ("previous" -> "previou")
+_SYNONYM_TOKENS = {
+    tokenize(word)[0]: tokenize(canonical)[0] for word, canonical in SYNONYMS.items()
+}
+
+
+def canonical_tokens(question: str) -> list[str]:
+    return [_SYNONYM_TOKENS.get(token, token) for token in tokenize(question)]
+
+
+def guard_tokens(question: str) -> list[str]:
+    """
+    Numbers, quoted literals, negations, relation words and comparison,
+    ordering and aggregate words, in order. Hashed embeddings barely move
+    when one of these changes ("2023" / "2024", "excluding" / "including").
+    """
+    text = (question or "").lower()
+    guards = [
+        (match.start(), match.group().strip("'\""))
+        for match in LITERAL_PATTERN.finditer(text)
+    ]
+    guards += [(match.start(), "not") for match in NEGATION_PATTERN.finditer(text)]
+    guards += [
+        (match.start(), "by" if match.group() == "per" else match.group())
+        for match in RELATION_PATTERN.finditer(text)
+    ]
+    words = [token for token in canonical_tokens(question) if token in GUARD_WORDS]
+    return [value for _, value in sorted(guards)] + words
+
+
+def _common_subsequence(a: list, b: list) -> int:
+    lengths = [0] * (len(b) + 1)
+    for x in a:
+        previous = 0
+        for j, y in enumerate(b):
+            current = lengths[j + 1]
+            lengths[j + 1] = previous + 1 if x == y else max(lengths[j + 1], lengths[j])
+            previous = current
+    return lengths[-1]
+
+
+def same_meaning(question: str, cached_question: str) -> bool:
+    """
+    Verifies a similarity hit before its SQL is reused: guard tokens must
+    match exactly, the words both questions share must come in the same
+    order ("orders per customer" is not "customers per order"), and at most
+    SEMANTIC_CACHE_MAX_EXTRA_WORDS words may appear in only one of them.
+    """
+    if guard_tokens(question) != guard_tokens(cached_question):
+        return False
+    a, b = canonical_tokens(question), canonical_tokens(cached_question)
+    if len(set(a) ^ set(b)) > SEMANTIC_CACHE_MAX_EXTRA_WORDS:
+        return False
+    shared = set(a) & set(b)
+    a = [token for token in a if token in shared]
+    b = [token for token in b if token in shared]
+    return _common_subsequence(a, b) == min(len(a), len(b))
+
+
+def _bucket(feature: str) -> tuple[int, float]:
+    h = zlib.crc32(feature.encode())
+    return h % SEMANTIC_CACHE_DIM, (1.0 if (h >> 31) & 1 else -1.0)
+
+
+def embed(question: str) -> np.ndarray:
+    """
+    Offline hashed embedding: stemmed words, with common synonyms folded,
+    plus character trigrams, hashed into SEMANTIC_CACHE_DIM signed buckets
+    and L2-normalized. Trigrams give partial credit to related word forms.
+    It only shortlists candidates; same_meaning decides.
+    """
+    vector = np.zeros(SEMANTIC_CACHE_DIM, dtype=np.float32)
+    for word in canonical_tokens(question):
+        index, sign = _bucket("w:" + word)
+        vector[index] += sign * WORD_WEIGHT
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            index, sign = _bucket("t:" + padded[i : i + 3])
+            vector[index] += sign * TRIGRAM_WEIGHT
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class VectorIndex:
+    """
+    Question vectors for one datasource in a single float32 matrix, so a lookup
+    is one matrix-vector product. Rows are removed by swapping in the last row.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.vectors = np.zeros((capacity, SEMANTIC_CACHE_DIM), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.entries: list[dict] = []
+        self.rows: dict[str, int] = {}  # cache_key -> row
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.last_used.nbytes
+
+    def add(self, vector: np.ndarray, entry: dict):
+        row = self.rows.get(entry["cache_key"])
+        if row is not None:
+            # Same question and context again: replace, don't duplicate
+            self.vectors[row] = vector
+            self.last_used[row] = time.time()
+            self.entries[row] = entry
+            return
+        n = len(self.entries)
+        if n == len(self.vectors):
+            grow = max(1024, n)
+            self.vectors = np.vstack(
+                [self.vectors, np.zeros((grow, SEMANTIC_CACHE_DIM), dtype=np.float32)]
+            )
+            self.last_used = np.concatenate([self.last_used, np.zeros(grow)])
+        self.vectors[n] = vector
+        self.last_used[n] = time.time()
+        self.entries.append(entry)
+        self.rows[entry["cache_key"]] = n
+
+    def remove(self, row: int):
+        last = len(self.entries) - 1
+        del self.rows[self.entries[row]["cache_key"]]
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.last_used[row] = self.last_used[last]
+            self.entries[row] = self.entries[last]
+            self.rows[self.entries[row]["cache_key"]] = row
+        self.entries.pop()
+
+    def discard(self, entry: dict):
+        row = self.rows.get(entry["cache_key"])
+        if row is not None and self.entries[row] is entry:
+            self.remove(row)
+
+    def evict_lru(self, count: int = 1):
+        n = len(self.entries)
+        count = min(count, n)
+        if not count:
+            return
+        victims = np.argpartition(self.last_used[:n], count - 1)[:count]
+        # Highest rows first, so a swapped-in last row is never a pending victim
+        for row in sorted(victims.tolist(), reverse=True):
+            self.remove(row)
+
+    def search(self, vector: np.ndarray, k: int) -> list[tuple[int, float]]:
+        n = len(self.entries)
+        if not n:
+            return []
+        scores = self.vectors[:n] @ vector
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+class SemanticCache:
+    def __init__(self):
+        self._indexes: dict[str, VectorIndex] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _index(self, datasource_id) -> VectorIndex:
+        key = str(datasource_id)
+        index = self._indexes.get(key)
+        if index is None:
+            index = VectorIndex()
+            # Warm from the persistent exact-match cache
+            with session_scope() as session:
+                rows = (
+                    session.query(GeneratedSqlCache)
+                    .filter_by(data_source_id=key)
+                    .order_by(GeneratedSqlCache.created_at.desc())
+                    .limit(SEMANTIC_CACHE_MAX_ENTRIES)
+                    .all()
+                )
+                for row in rows:
+                    if not sql_cache.is_expired(row.created_at):
+                        index.add(embed(row.question), self._entry_from_row(row))
+            self._indexes[key] = index
+        return index
+
+    @staticmethod
+    def _entry_from_row(row) -> dict:
+        return {
+            "cache_key": row.cache_key,
+            "question": row.question,
+            "context_key": row.context_hash or sql_cache.context_hash(),
+            "tables": list(row.tables),
+            "schema_hash": row.schema_hash,
+            "sql": row.sql,
+            "generation_ms": row.generation_ms,
+            "created_at": row.created_at,
+        }
+
+    def _enforce_limits(self):
+        total = sum(index.nbytes for index in self._indexes.values())
+        while self._indexes and (
+            total > SEMANTIC_CACHE_MAX_BYTES
+            or any(len(i) > SEMANTIC_CACHE_MAX_ENTRIES for i in self._indexes.values())
+        ):
+            largest = max(self._indexes.values(), key=len)
+            if not len(largest):
+                break
+            count = max(1, len(largest) // 10)
+            largest.evict_lru(count)
+            self.evictions += count
+            if len(largest) * 2 < len(largest.vectors):
+                # Give memory back once the index has shrunk well below capacity
+                keep = max(1024, len(largest))
+                largest.vectors = largest.vectors[:keep].copy()
+                largest.last_used = largest.last_used[:keep].copy()
+            total = sum(index.nbytes for index in self._indexes.values())
+
+    def add(
+        self,
+        question: str,
+        datasource_id,
+        tables,
+        schema_string,
+        sql,
+        generation_ms,
+        context=None,
+    ):
+        sql = (sql or "").strip()
+        if not sql:
+            return
+        entry = {
+            "cache_key": sql_cache.make_key(question, datasource_id, context),
+            "question": question,
+            "context_key": sql_cache.context_hash(context),
+            "tables": list(tables),
+            "schema_hash": sql_cache.schema_hash(schema_string),
+            "sql": sql,
+            "generation_ms": generation_ms,
+            "created_at": datetime.now(),
+        }
+        with self._lock:
+            self._index(datasource_id).add(embed(question), entry)
+            self._enforce_limits()
+
+    def lookup(self, question: str, datasource_id, context=None):
+        """
+        Cached SQL for the closest earlier question at or above the similarity
+        threshold that same_meaning confirms, validated against the current
+        schema like an exact hit. Expired and stale entries are dropped here
+        and from generated_sql_cache.
+        """
+        vector = embed(question)
+        context_key = sql_cache.context_hash(context)
+
+        with self._lock:
+            index = self._index(datasource_id)
+            candidates = [
+                (row, score, index.entries[row])
+                for row, score in index.search(vector, SEMANTIC_CACHE_TOP_K)
+                if score >= SEMANTIC_CACHE_THRESHOLD
+                and index.entries[row]["context_key"] == context_key
+            ]
+
+        for row, score, entry in candidates:
+            if not same_meaning(question, entry["question"]):
+                continue
+            schema_info = None
+            if not sql_cache.is_expired(entry["created_at"]):
+                schema_info = sql_cache.current_schema(
+                    entry["tables"], datasource_id, entry["schema_hash"]
+                )
+            if schema_info is None:
+                with self._lock:
+                    index.discard(entry)
+                sql_cache.delete(entry["cache_key"])
+                continue
+
+            with self._lock:
+                if row < len(index) and index.entries[row] is entry:
+                    index.last_used[row] = time.time()
+                self.hits += 1
+            return {
+                "sql": entry["sql"],
+                "tables": entry["tables"],
+                "schema_info": schema_info,
+                "generation_ms": entry["generation_ms"],
+                "similarity": round(score, 4),
+                "matched_question": entry["question"],
+            }
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def clear(self, datasource_id=None):
+        with self._lock:
+            if datasource_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(str(datasource_id), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "datasources": len(self._indexes),
+                "entries": sum(len(i) for i in self._indexes.values()),
+                "bytes": sum(i.nbytes for i in self._indexes.values()),
+                "max_bytes": SEMANTIC_CACHE_MAX_BYTES,
+                "threshold": SEMANTIC_CACHE_THRESHOLD,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+semantic_cache = SemanticCache()
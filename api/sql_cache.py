@@ -0,0 +1,194 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from dotenv import load_dotenv
+
+from db_models import GeneratedSqlCache
+from metadata_store import session_scope
+from utils import fetch_schema_for_tables, generate_llm_schema
+
+load_dotenv()  # Load from .env file
+
+SQL_CACHE_TTL_SECONDS = int(os.getenv("SQL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+class SqlCacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.saved_ms = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit: bool, saved_ms: int = 0, stale: bool = False):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.saved_ms += saved_ms or 0
+            else:
+                self.misses += 1
+                self.stale += int(stale)
+
+
+stats = SqlCacheStats()
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"\s+", " ", question or "").strip().lower()
+    return question.rstrip("?!. ")
+
+
+def make_key(question: str, datasource_id, context=None) -> str:
+    """
+    Cache key for a question on a datasource. Chat context changes what a
+    follow-up question means, so its text messages are part of the key.
+    """
+    payload = json.dumps(
+        [normalize_question(question), str(datasource_id), context_texts(context)]
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def schema_hash(schema_string: str) -> str:
+    return hashlib.sha256(schema_string.encode()).hexdigest()
+
+
+def is_expired(created_at: datetime) -> bool:
+    return created_at + timedelta(seconds=SQL_CACHE_TTL_SECONDS) <= datetime.now()
+
+
+def current_schema(tables: list, datasource_id, expected_hash: str):
+    """Schema info for `tables` if it still hashes to `expected_hash`, else None."""
+    schema_info = fetch_schema_for_tables(tables, datasource_id)
+    if schema_hash(generate_llm_schema(schema_info)) != expected_hash:
+        return None
+    return schema_info
+
+
+def context_texts(context=None) -> list[str]:
+    return [
+        normalize_question(msg["content"].get("text") or "")
+        for msg in (context or [])
+        if msg.get("type") == "text"
+    ]
+
+
+def context_hash(context=None) -> str:
+    return hashlib.sha256("\n".join(context_texts(context)).encode()).hexdigest()
+
+
+def lookup(question: str, datasource_id, context=None):
+    """
+    Cached SQL for the question, or None. An entry only counts as a hit while
+    it is within its TTL and the schema markdown for its tables still hashes
+    to the value it was generated from; otherwise it is dropped.
+    """
+    key = make_key(question, datasource_id, context)
+
+    with session_scope() as session:
+        entry = session.get(GeneratedSqlCache, key)
+        if entry is None:
+            stats.record(hit=False)
+            return None
+
+        schema_info = None
+        if not is_expired(entry.created_at):
+            schema_info = current_schema(entry.tables, datasource_id, entry.schema_hash)
+
+        if schema_info is None:
+            session.delete(entry)
+            session.commit()
+            stats.record(hit=False, stale=True)
+            return None
+
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_hit_at = datetime.now()
+        session.commit()
+        stats.record(hit=True, saved_ms=entry.generation_ms)
+
+        return {
+            "sql": entry.sql,
+            "tables": list(entry.tables),
+            "schema_info": schema_info,
+            "generation_ms": entry.generation_ms,
+        }
+
+
+def store(
+    question: str,
+    datasource_id,
+    tables: list,
+    schema_string: str,
+    sql: str,
+    generation_ms: int,
+    context=None,
+):
+    sql = (sql or "").strip()
+    if not sql:
+        return
+
+    key = make_key(question, datasource_id, context)
+    with session_scope() as session:
+        entry = session.get(GeneratedSqlCache, key) or GeneratedSqlCache(cache_key=key)
+        entry.data_source_id = str(datasource_id)
+        entry.question = question
+        entry.context_hash = context_hash(context)
+        entry.tables = list(tables)
+        entry.schema_hash = schema_hash(schema_string)
+        entry.sql = sql
+        entry.generation_ms = generation_ms
+        entry.hit_count = 0
+        entry.created_at = datetime.now()
+        entry.last_hit_at = None
+        session.merge(entry)
+        session.commit()
+
+
+def delete(cache_key: str):
+    with session_scope() as session:
+        entry = session.get(GeneratedSqlCache, cache_key)
+        if entry is not None:
+            session.delete(entry)
+            session.commit()
+
+
+def clear(datasource_id=None) -> int:
+    with session_scope() as session:
+        query = session.query(GeneratedSqlCache)
+        if datasource_id is not None:
+            query = query.filter_by(data_source_id=str(datasource_id))
+        removed = query.delete()
+        session.commit()
+    return removed
+
+
+def get_stats() -> dict:
+    with session_scope() as session:
+        entries, total_hits, total_saved_ms = session.query(
+            func.count(GeneratedSqlCache.cache_key),
+            func.coalesce(func.sum(GeneratedSqlCache.hit_count), 0),
+            func.coalesce(
+                func.sum(GeneratedSqlCache.hit_count * GeneratedSqlCache.generation_ms),
+                0,
+            ),
+        ).one()
+
+    lookups = stats.hits + stats.misses
+    return {
+        "entries": entries,
+        "ttl_seconds": SQL_CACHE_TTL_SECONDS,
+        # Since this process started
+        "hits": stats.hits,
+        "misses": stats.misses,
+        "stale": stats.stale,
+        "hit_rate": round(stats.hits / lookups, 4) if lookups else 0.0,
+        "saved_ms": stats.saved_ms,
+        # Over the lifetime of the stored entries
+        "total_hits": int(total_hits),
+        "total_saved_ms": int(total_saved_ms),
+    }
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+import sqlglot
+from sqlglot import exp
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+from result_cache import sqlglot_dialect, fingerprint
+
+load_dotenv()  # Load from .env file
+
+# Row cap added to (or enforced on) every query; a request's `max_rows` can
+# only lower it
+GUARD_MAX_ROWS = int(os.getenv("GUARD_MAX_ROWS", "100000"))
+
+# EXPLAIN thresholds (0 turns a check off). Above "confirm" the client must
+# resend with `confirmed: true`; above "reject" the query never runs.
+GUARD_CONFIRM_COST = float(os.getenv("GUARD_CONFIRM_COST", "1000000"))
+GUARD_REJECT_COST = float(os.getenv("GUARD_REJECT_COST", "0"))
+GUARD_CONFIRM_ROWS = float(os.getenv("GUARD_CONFIRM_ROWS", "0"))
+GUARD_REJECT_ROWS = float(os.getenv("GUARD_REJECT_ROWS", "0"))
+GUARD_CONFIRM_BYTES = float(os.getenv("GUARD_CONFIRM_BYTES", str(10 * 1024**3)))
+GUARD_REJECT_BYTES = float(os.getenv("GUARD_REJECT_BYTES", "0"))
+
+GUARD_PLAN_CACHE_TTL_SECONDS = int(os.getenv("GUARD_PLAN_CACHE_TTL_SECONDS", "600"))
+GUARD_PLAN_CACHE_SIZE = int(os.getenv("GUARD_PLAN_CACHE_SIZE", "1000"))
+
+# Statements that must not appear anywhere in a query, CTEs included
+WRITE_EXPRESSIONS = (
+    exp.Insert,
+    exp.Update,
+    exp.Delete,
+    exp.Merge,
+    exp.Create,
+    exp.Drop,
+    exp.Alter,
+    exp.Command,
+    exp.Into,
+)
+
+
+class GuardError(Exception):
+    """The query was refused before reaching the database."""
+
+
+def _limit_value(node):
+    if isinstance(node, exp.Limit):
+        value = node.expression
+    elif isinstance(node, exp.Fetch):
+        value = node.args.get("count")
+    else:
+        return None
+    if isinstance(value, exp.Literal) and not value.is_string:
+        try:
+            return int(value.this)
+        except ValueError:
+            return None
+    return None
+
+
+def row_cap(requested: int = None) -> int:
+    """
+    The LIMIT cap for a query: GUARD_MAX_ROWS, or the request's `max_rows`
+    when that is lower. A request can't raise or disable the server's cap.
+    """
+    if requested is None or requested <= 0:
+        return GUARD_MAX_ROWS
+    return min(requested, GUARD_MAX_ROWS) if GUARD_MAX_ROWS else requested
+
+
+def enforce_read_only(sql: str, dialect: str, max_rows: int = GUARD_MAX_ROWS):
+    """
+    Parses `sql` and returns `(sql, applied_limit)`. Anything other than a
+    single read-only query raises GuardError. A missing LIMIT is added and a
+    larger literal LIMIT (or FETCH FIRST) is lowered to `max_rows`;
+    `applied_limit` is None when the query was already within bounds and is
+    returned unchanged.
+    """
+    read = sqlglot_dialect(dialect)
+    try:
+        statements = [s for s in sqlglot.parse(sql, read=read) if s is not None]
+    except sqlglot.errors.SqlglotError as e:
+        raise GuardError(f"Could not parse SQL: {e}") from e
+    if len(statements) != 1:
+        raise GuardError("Only a single SQL statement can be run")
+
+    expression = statements[0]
+    if not isinstance(expression, exp.Query):
+        raise GuardError("Only SELECT queries can be run")
+    if any(isinstance(node, WRITE_EXPRESSIONS) for node in expression.walk()):
+        raise GuardError("Queries that write or change data cannot be run")
+
+    if not max_rows:
+        return sql, None
+
+    limit = expression.args.get("limit")
+    if limit is not None:
+        value = _limit_value(limit)
+        if value is not None and value <= max_rows:
+            return sql, None
+        # Larger, or not a literal (parameters, expressions): replaced
+        limit.pop()
+    expression.limit(max_rows, copy=False)
+
+    return expression.sql(dialect=read), max_rows
+
+
+# --- EXPLAIN estimates ---
+
+
+def _explain_postgresql(conn, sql):
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    return {"rows": root.get("Plan Rows"), "cost": root.get("Total Cost")}
+
+
+def _explain_mysql(conn, sql):
+    plan = json.loads(conn.execute(text(f"EXPLAIN FORMAT=JSON {sql}")).scalar())
+    block = plan.get("query_block", {})
+    rows = None
+    stack = [block]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            produced = node.get("rows_produced_per_join")
+            if produced is not None:
+                rows = max(rows or 0, float(produced))
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    cost = block.get("cost_info", {}).get("query_cost")
+    return {"rows": rows, "cost": float(cost) if cost is not None else None}
+
+
+def _explain_snowflake(conn, sql):
+    plan = json.loads(conn.execute(text(f"EXPLAIN USING JSON {sql}")).scalar())
+    stats = plan.get("GlobalStats", {})
+    return {
+        "bytes": stats.get("bytesAssigned"),
+        "partitions": stats.get("partitionsAssigned"),
+        "partitions_total": stats.get("partitionsTotal"),
+    }
+
+
+EXPLAINERS = {
+    "postgresql": _explain_postgresql,
+    "mysql": _explain_mysql,
+    "mariadb": _explain_mysql,
+    "snowflake": _explain_snowflake,
+}
+
+
+class PlanCache:
+    """EXPLAIN estimates by datasource and SQL fingerprint, LRU with a TTL."""
+
+    def __init__(
+        self, ttl_seconds=GUARD_PLAN_CACHE_TTL_SECONDS, size=GUARD_PLAN_CACHE_SIZE
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.size = size
+        self._plans: "OrderedDict[tuple, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._plans.get(key)
+            if item is None or time.time() - item[0] > self.ttl_seconds:
+                self._plans.pop(key, None)
+                self.misses += 1
+                return None
+            self._plans.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, estimate: dict):
+        with self._lock:
+            self._plans[key] = (time.time(), estimate)
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.size:
+                self._plans.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._plans),
+                "hits": self.hits,
+                "misses": self.misses,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+plan_cache = PlanCache()
+
+
+def estimate(engine, sql: str, dialect: str, datasource_key: str):
+    """EXPLAIN-based estimate for `sql`, or None if the dialect has none."""
+    explainer = EXPLAINERS.get(engine.dialect.name)
+    if explainer is None:
+        return None
+
+    key = (datasource_key, fingerprint(sql, dialect) or sql)
+    cached = plan_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with engine.connect() as conn:
+        result = explainer(conn, sql)
+    plan_cache.put(key, result)
+    return result
+
+
+THRESHOLDS = {
+    "cost": (GUARD_CONFIRM_COST, GUARD_REJECT_COST),
+    "rows": (GUARD_CONFIRM_ROWS, GUARD_REJECT_ROWS),
+    "bytes": (GUARD_CONFIRM_BYTES, GUARD_REJECT_BYTES),
+}
+
+
+def check_estimate(estimated: dict) -> tuple[str, str]:
+    """
+    ("ok" | "confirm" | "reject", reason) for an EXPLAIN estimate against the
+    configured thresholds.
+    """
+    verdict, reason = "ok", None
+    for measure, (confirm_at, reject_at) in THRESHOLDS.items():
+        value = (estimated or {}).get(measure)
+        if value is None:
+            continue
+        if reject_at and value > reject_at:
+            return (
+                "reject",
+                f"Estimated {measure} {value:,.0f} is over {reject_at:,.0f}",
+            )
+        if confirm_at and value > confirm_at and verdict == "ok":
+            verdict = "confirm"
+            reason = f"Estimated {measure} {value:,.0f} is over {confirm_at:,.0f}"
+    return verdict, reason
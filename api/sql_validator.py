@@ -0,0 +1,243 @@
+import os
+import re
+import json
+import difflib
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.optimizer.scope import Scope, traverse_scope
+from dotenv import load_dotenv
+
+from db_models import DataSource
+from metadata_store import session_scope
+from result_cache import sqlglot_dialect
+from utils import list_tables, reflect_tables
+from result_tables import expression_tables
+
+load_dotenv()  # Load from .env file
+
+# Dialect the SQL prompts ask the LLM to write in
+GENERATION_DIALECT = os.getenv("SQL_GENERATION_DIALECT", "postgres")
+
+FENCE_PATTERN = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+
+
+def _suggest(name: str, candidates) -> str:
+    matches = difflib.get_close_matches(name.lower(), list(candidates), n=1)
+    return matches[0] if matches else None
+
+
+def _error(kind: str, message: str, **fields) -> dict:
+    return {"type": kind, "message": message, **fields}
+
+
+def datasource_dialect(datasource_id):
+    """sqlglot dialect of a saved datasource, or None if it is unknown."""
+    try:
+        datasource_id = int(datasource_id)
+    except (TypeError, ValueError):
+        return None
+    with session_scope() as session:
+        ds = session.get(DataSource, datasource_id)
+        if ds is None:
+            return None
+        if ds.type == "file":
+            return "duckdb"
+        return sqlglot_dialect(json.loads(ds.config).get("dialect"))
+
+
+def load_schema(datasource_id) -> dict:
+    """Lower-cased table name -> set of lower-cased column names."""
+    tables = list_tables(datasource_id)
+    reflected = reflect_tables(tables, datasource_id)
+    return {
+        name.lower(): {col["name"].lower() for col in info["columns"]}
+        for name, info in reflected.items()
+        if not isinstance(info, str)
+    }
+
+
+def _source_columns(source, schema: dict):
+    """Output columns of a scope source, or None when they can't be known."""
+    if isinstance(source, exp.Table):
+        return schema.get(source.name.lower())
+    if isinstance(source, Scope) and isinstance(source.expression, exp.Query):
+        if source.expression.is_star:
+            return None
+        return {name.lower() for name in source.expression.named_selects}
+    return None
+
+
+def _visible_sources(scope: Scope, schema: dict) -> dict:
+    """
+    Alias -> output columns for every source a column in `scope` can refer
+    to, including outer queries for correlated subqueries.
+    """
+    sources = {}
+    while scope is not None:
+        for alias, source in scope.sources.items():
+            sources.setdefault(alias.lower(), _source_columns(source, schema))
+        scope = scope.parent
+    return sources
+
+
+def _check_scope(scope: Scope, schema: dict, errors: list):
+    cte_names = {name.lower() for name in scope.cte_sources}
+    for table in scope.tables:
+        name = table.name.lower()
+        if name in cte_names or name in schema:
+            continue
+        errors.append(
+            _error(
+                "unknown_table",
+                f"Table '{table.name}' does not exist",
+                table=table.name,
+                suggestion=_suggest(name, schema),
+            )
+        )
+
+    sources = _visible_sources(scope, schema)
+    select_aliases = {
+        s.alias.lower() for s in scope.expression.selects if isinstance(s, exp.Alias)
+    }
+
+    for column in scope.columns:
+        if isinstance(column.this, exp.Star):
+            continue
+        if column.find_ancestor(exp.Select) is not scope.expression:
+            continue  # checked with the subquery's own scope
+        name = column.name.lower()
+        if column.table:
+            alias = column.table.lower()
+            if alias not in sources:
+                errors.append(
+                    _error(
+                        "unknown_alias",
+                        f"'{column.table}' in '{column.sql()}' is not a table or alias in this query",
+                        table=column.table,
+                        column=column.name,
+                        suggestion=_suggest(alias, sources),
+                    )
+                )
+                continue
+            columns = sources[alias]
+            if columns is None or name in columns:
+                continue
+            errors.append(
+                _error(
+                    "unknown_column",
+                    f"Column '{column.name}' does not exist in '{column.table}'",
+                    table=column.table,
+                    column=column.name,
+                    suggestion=_suggest(name, columns),
+                )
+            )
+            continue
+
+        # Unqualified: may also name a SELECT alias (ORDER BY, GROUP BY), and
+        # is only flagged when every source's columns are known
+        if name in select_aliases or any(c is None for c in sources.values()):
+            continue
+        if any(name in columns for columns in sources.values()):
+            continue
+        errors.append(
+            _error(
+                "unknown_column",
+                f"Column '{column.name}' does not exist in any table of the query",
+                column=column.name,
+                suggestion=_suggest(name, set().union(set(), *sources.values())),
+            )
+        )
+
+
+def validate_sql(
+    sql: str,
+    datasource_id,
+    target_dialect: str = None,
+    source_dialect: str = GENERATION_DIALECT,
+    result_tables: dict = None,
+) -> dict:
+    """
+    Checks `sql` locally, without touching the datasource: it must parse as a
+    single SELECT, and every table and column it references must exist in the
+    datasource's reflected schema (CTEs, subqueries and aliases are resolved
+    per scope). Valid SQL is transpiled from `source_dialect` to
+    `target_dialect`, the datasource's own dialect by default.
+
+    `result_tables` (table name -> column names) adds stored results of
+    earlier queries. SQL that reads only those runs locally on DuckDB, so it
+    is transpiled to duckdb; SQL that mixes them with datasource tables is
+    rejected.
+
+    Returns `{"valid", "errors", "sql", "dialect"}`; each error has a `type`
+    (syntax, not_a_query, unknown_table, unknown_alias, unknown_column,
+    mixed_sources), a
+    message and, where there is a close match, a `suggestion`.
+    """
+    sql = FENCE_PATTERN.sub("", sql or "").strip()
+    target = sqlglot_dialect(target_dialect) or datasource_dialect(datasource_id)
+    result = {"valid": False, "errors": [], "sql": sql, "dialect": target}
+
+    try:
+        statements = [
+            s for s in sqlglot.parse(sql, read=source_dialect) if s is not None
+        ]
+    except sqlglot.errors.ParseError as e:
+        for detail in e.errors:
+            result["errors"].append(
+                _error(
+                    "syntax",
+                    detail.get("description") or str(e),
+                    line=detail.get("line"),
+                    position=detail.get("col"),
+                )
+            )
+        return result
+    except sqlglot.errors.SqlglotError as e:
+        result["errors"].append(_error("syntax", str(e)))
+        return result
+
+    if len(statements) != 1 or not isinstance(statements[0], exp.Query):
+        result["errors"].append(_error("not_a_query", "Expected a single SELECT query"))
+        return result
+
+    expression = statements[0]
+    schema = load_schema(datasource_id)
+    if result_tables:
+        schema.update(result_tables)
+        tables = expression_tables(expression, source_dialect)
+        results = tables & set(result_tables)
+        if results and results != tables:
+            others = sorted(tables - results)
+            result["errors"].append(
+                _error(
+                    "mixed_sources",
+                    "Earlier results can't be joined with other tables or files "
+                    f"({', '.join(others)}); query one or the other",
+                    tables=others,
+                )
+            )
+            return result
+        if results:
+            target = result["dialect"] = "duckdb"
+    if schema:
+        for scope in traverse_scope(expression):
+            _check_scope(scope, schema, result["errors"])
+    if result["errors"]:
+        return result
+
+    result["valid"] = True
+    if target and target != source_dialect:
+        result["sql"] = expression.sql(dialect=target, pretty=True)
+    return result
+
+
+def describe_errors(errors: list) -> str:
+    """Validation errors as a bullet list for a repair prompt."""
+    lines = []
+    for error in errors:
+        line = f"- {error['message']}"
+        if error.get("suggestion"):
+            line += f" (did you mean '{error['suggestion']}'?)"
+        lines.append(line)
+    return "\n".join(lines)
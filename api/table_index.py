@@ -0,0 +1,260 @@
+import os
+import re
+import math
+import threading
+from collections import Counter
+
+from sqlalchemy import text, bindparam
+from dotenv import load_dotenv
+
+from metadata_store import session_scope
+from utils import list_tables, reflect_tables
+
+load_dotenv()  # Load from .env file
+
+TABLE_INDEX_TOP_K = int(os.getenv("TABLE_INDEX_TOP_K", "5"))
+TABLE_INDEX_MIN_SCORE = float(os.getenv("TABLE_INDEX_MIN_SCORE", "1.0"))
+TABLE_INDEX_MIN_COVERAGE = float(os.getenv("TABLE_INDEX_MIN_COVERAGE", "0.5"))
+TABLE_INDEX_RELATIVE_CUTOFF = float(os.getenv("TABLE_INDEX_RELATIVE_CUTOFF", "0.5"))
+
+# Field weights: a hit on the table name says more than one in a description
+NAME_WEIGHT = 3
+COLUMN_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# fmt: off
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "by", "can", "did", "do", "does", "each",
+    "for", "from", "give", "how", "i", "in", "is", "it", "list", "many", "me",
+    "much", "of", "on", "or", "per", "show", "than", "that", "the", "their",
+    "them", "there", "this", "to", "was", "were", "what", "when", "where", "which",
+    "who", "with", "would", "all", "get", "find", "our", "we", "my", "be",
+}
+# fmt: on
+
+
+def tokenize(value: str) -> list[str]:
+    """Lowercased word tokens; snake_case and camelCase are split, plurals folded."""
+    if not value:
+        return []
+    value = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", value)
+    tokens = []
+    for token in re.split(r"[^a-zA-Z0-9]+", value.lower()):
+        if not token or token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class TableIndex:
+    """
+    BM25 index over one datasource's tables. A table's document is its name,
+    its description, and the names and descriptions of its columns. Documents
+    can be replaced one at a time, so saving descriptions for a few tables only
+    re-tokenizes those tables.
+    """
+
+    def __init__(self):
+        self.docs: dict[str, Counter] = {}
+        self.doc_freq: Counter = Counter()
+        self.total_length = 0
+        self.references: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, table_name: str, terms: Counter, references: set[str]):
+        with self._lock:
+            self._remove(table_name)
+            self.docs[table_name] = terms
+            self.doc_freq.update(terms.keys())
+            self.total_length += sum(terms.values())
+            self.references[table_name] = set(references)
+
+    def neighbours(self, table_name: str) -> set[str]:
+        """Tables joined to `table_name` by a foreign key, in either direction."""
+        with self._lock:
+            outgoing = self.references.get(table_name, set())
+            incoming = {
+                name for name, refs in self.references.items() if table_name in refs
+            }
+        return (outgoing | incoming) - {table_name}
+
+    def _remove(self, table_name: str):
+        old = self.docs.pop(table_name, None)
+        if old is None:
+            return
+        self.doc_freq.subtract(old.keys())
+        self.doc_freq += Counter()  # drop zero counts
+        self.total_length -= sum(old.values())
+
+    def search(self, query_terms: list[str]) -> list[tuple[str, float]]:
+        with self._lock:
+            n_docs = len(self.docs)
+            if not n_docs or not query_terms:
+                return []
+            avg_length = self.total_length / n_docs
+
+            scores = []
+            for table_name, terms in self.docs.items():
+                doc_length = sum(terms.values())
+                score = 0.0
+                for term in set(query_terms):
+                    tf = terms.get(term, 0)
+                    if not tf:
+                        continue
+                    df = self.doc_freq[term]
+                    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_length / avg_length)
+                    score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                if score > 0:
+                    scores.append((table_name, score))
+
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores
+
+
+_indexes: dict[str, TableIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _load_documents(datasource_id, tables=None) -> dict[str, tuple[Counter, set]]:
+    table_filter = "AND table_name IN :tables" if tables else ""
+    params = {"datasource_id": datasource_id}
+
+    table_query = text(
+        f"""
+        SELECT table_name, table_description FROM table_metadata
+        WHERE data_source_id = :datasource_id {table_filter}
+    """
+    )
+    column_query = text(
+        f"""
+        SELECT table_name, column_name, column_description FROM column_metadata
+        WHERE data_source_id = :datasource_id {table_filter}
+    """
+    )
+    if tables:
+        table_query = table_query.bindparams(bindparam("tables", expanding=True))
+        column_query = column_query.bindparams(bindparam("tables", expanding=True))
+        params["tables"] = list(tables)
+
+    with session_scope() as session:
+        table_rows = session.execute(table_query, params).fetchall()
+        column_rows = session.execute(column_query, params).fetchall()
+
+    documents: dict[str, Counter] = {}
+
+    def doc(name):
+        if name not in documents:
+            documents[name] = Counter({t: NAME_WEIGHT for t in tokenize(name)})
+        return documents[name]
+
+    described: dict[str, set] = {}
+    for row in table_rows:
+        terms = doc(row.table_name)
+        for token in tokenize(row.table_description or ""):
+            terms[token] += DESCRIPTION_WEIGHT
+    for row in column_rows:
+        terms = doc(row.table_name)
+        described.setdefault(row.table_name, set()).add(row.column_name)
+        for token in tokenize(row.column_name):
+            terms[token] += COLUMN_WEIGHT
+        for token in tokenize(row.column_description or ""):
+            terms[token] += DESCRIPTION_WEIGHT
+
+    # Undescribed tables are still findable by their table and column names
+    names = (
+        list(tables)
+        if tables
+        else sorted(set(documents) | set(list_tables(datasource_id)))
+    )
+    reflected = reflect_tables(names, datasource_id)
+
+    result = {}
+    for name in names:
+        terms = doc(name)
+        references = set()
+        info = reflected.get(name)
+        if isinstance(info, dict):
+            for col in info["columns"]:
+                if col["name"] not in described.get(name, ()):
+                    for token in tokenize(col["name"]):
+                        terms[token] += COLUMN_WEIGHT
+            references = {fk["referred_table"] for fk in info["foreign_keys"].values()}
+        result[name] = (terms, references)
+    return result
+
+
+def get_index(datasource_id) -> TableIndex:
+    key = str(datasource_id)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            return index
+
+    index = TableIndex()
+    for name, (terms, references) in _load_documents(datasource_id).items():
+        index.upsert(name, terms, references)
+
+    with _indexes_lock:
+        return _indexes.setdefault(key, index)
+
+
+def refresh_tables(datasource_id, tables):
+    """Re-index only `tables` after their metadata changed."""
+    with _indexes_lock:
+        index = _indexes.get(str(datasource_id))
+    if index is None or not tables:
+        return  # built fresh on next use
+
+    for name, (terms, references) in _load_documents(datasource_id, tables).items():
+        index.upsert(name, terms, references)
+
+
+def drop_index(datasource_id=None):
+    with _indexes_lock:
+        if datasource_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(str(datasource_id), None)
+
+
+def select_tables(datasource_id, question: str) -> tuple[list[str], bool]:
+    """
+    Ranks tables for a question without calling the LLM. Returns the selected
+    tables (top hits plus their FK neighbours) and whether retrieval is
+    confident enough to skip the LLM table picker.
+    """
+    query_terms = tokenize(question)
+    index = get_index(datasource_id)
+    ranked = index.search(query_terms)
+    if not ranked:
+        return [], False
+
+    top_score = ranked[0][1]
+    selected = [
+        name
+        for name, score in ranked[:TABLE_INDEX_TOP_K]
+        if score >= top_score * TABLE_INDEX_RELATIVE_CUTOFF
+    ]
+
+    covered = {
+        term for term in query_terms for name in selected if term in index.docs[name]
+    }
+    coverage = len(covered) / len(set(query_terms))
+    confident = (
+        top_score >= TABLE_INDEX_MIN_SCORE and coverage >= TABLE_INDEX_MIN_COVERAGE
+    )
+
+    for name in list(selected):
+        for neighbour in sorted(index.neighbours(name)):
+            if neighbour not in selected and neighbour in index.docs:
+                selected.append(neighbour)
+
+    return selected, confident
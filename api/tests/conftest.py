@@ -0,0 +1,47 @@
+import os
+import sys
+import json
+import tempfile
+
+# Settings are read when the modules are imported, so they are set first: a
+# throwaway metadata database, result store and file datasource directory
+_tmp = tempfile.mkdtemp(prefix="askbi-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'metadata.db')}"
+os.environ["RESULT_STORE_DIR"] = os.path.join(_tmp, "results")
+os.environ["FILE_DATASOURCE_DIR"] = os.path.join(_tmp, "files")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from db_models import Base, DataSource
+from metadata_store import engine, session_scope
+from file_engine import FILE_DATASOURCE_DIR
+
+Base.metadata.create_all(engine)
+
+
+@pytest.fixture
+def file_datasource():
+    """
+    Id of a saved file datasource with two CSV tables:
+    orders(order_id, customer_id, amount) and customers(customer_id, name).
+    """
+    os.makedirs(FILE_DATASOURCE_DIR, exist_ok=True)
+    files = {
+        "orders": "order_id,customer_id,amount\n1,1,9.5\n2,1,20.0\n3,2,4.25\n",
+        "customers": "customer_id,name\n1,Ada\n2,Grace\n",
+    }
+    for table, content in files.items():
+        with open(os.path.join(FILE_DATASOURCE_DIR, f"{table}.csv"), "w") as f:
+            f.write(content)
+
+    config = {"tables": {table: f"{table}.csv" for table in files}}
+    with session_scope() as session:
+        ds = session.query(DataSource).filter_by(name="shop").first()
+        if ds is None:
+            ds = DataSource(name="shop", type="file", config=json.dumps(config))
+            session.add(ds)
+            session.commit()
+        return ds.id
@@ -0,0 +1,25 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from chart_data import chart_data
+
+
+def test_aggregate_over_unknown_field_falls_back_to_sampling(tmp_path):
+    path = str(tmp_path / "r.parquet")
+    pq.write_table(pa.table({"region": ["n", "s", "n"], "amount": [1, 2, 3]}), path)
+    spec = {
+        "mark": "bar",
+        "encoding": {
+            "x": {"field": "region", "type": "nominal"},
+            "y": {"field": "amount", "aggregate": "sum"},
+        },
+    }
+
+    _, values, info = chart_data(path, spec)
+    assert info["method"] == "aggregate"
+    assert sorted(v["sum_amount"] for v in values) == [2, 4]
+
+    spec["encoding"]["y"] = {"field": "zz2", "aggregate": "sum"}
+    _, values, info = chart_data(path, spec)
+    assert info["method"] != "aggregate"
+    assert len(values) == 3
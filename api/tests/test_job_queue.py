@@ -0,0 +1,34 @@
+import time
+import threading
+from types import SimpleNamespace
+
+from job_queue import JobQueue, Job, FINISHED_STATUSES
+
+
+def wait_finished(queue: JobQueue, job_id: str) -> dict:
+    for _ in range(200):
+        job = queue.get(job_id)
+        if job["status"] in FINISHED_STATUSES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_cancel_before_the_query_is_registered_stops_it():
+    picked_up, release = threading.Event(), threading.Event()
+
+    def run(config, job_id, on_progress):
+        picked_up.set()
+        release.wait(5)  # e.g. still checking the query's cost
+        on_progress(100)
+        return {"status": "success", "query_id": job_id}
+
+    queue = JobQueue(workers=1)
+    config = SimpleNamespace(datasource_id=None, user_query="q", sql="SELECT 1")
+    queue.submit(Job("job-early-cancel", "ds:test", "user", config, run))
+    assert picked_up.wait(5)
+
+    assert queue.cancel("job-early-cancel")
+    release.set()
+    assert wait_finished(queue, "job-early-cancel")["status"] == "cancelled"
+    queue.shutdown()
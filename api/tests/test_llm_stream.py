@@ -0,0 +1,170 @@
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import llm_client
+
+
+class StubLLM:
+    """
+    Stands in for AsyncOpenAI: streams `chunks` with `delay` seconds between
+    them. After the first chunk it waits for `release`, so a caller that only
+    sees output once generation has finished deadlocks instead of passing.
+    """
+
+    def __init__(self, chunks, delay=0.0, release=None):
+        self.chunks = chunks
+        self.delay = delay
+        self.release = release
+        self.finished = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        if not stream:
+            await asyncio.sleep(self.delay)
+            message = SimpleNamespace(content="".join(self.chunks))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        return self._stream()
+
+    async def _stream(self):
+        for i, content in enumerate(self.chunks):
+            if i == 1 and self.release is not None:
+                await self.release.wait()
+            await asyncio.sleep(self.delay)
+            delta = SimpleNamespace(content=content)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+        self.finished = True
+
+
+@pytest.fixture
+def stub_llm():
+    previous = llm_client._client
+
+    def install(*args, **kwargs):
+        stub = StubLLM(*args, **kwargs)
+        llm_client.set_async_client(stub)
+        return stub
+
+    yield install
+    llm_client.set_async_client(previous)
+
+
+def test_first_token_arrives_before_generation_finishes(stub_llm):
+    async def run():
+        release = asyncio.Event()
+        stub = stub_llm(["SELECT", " 1", " FROM t"], release=release)
+        received = []
+        async for content in llm_client.stream([{"role": "user", "content": "q"}]):
+            received.append((content, stub.finished))
+            release.set()
+        return received
+
+    received = asyncio.run(asyncio.wait_for(run(), 5))
+    assert received[0] == ("SELECT", False)
+    assert "".join(content for content, _ in received) == "SELECT 1 FROM t"
+
+
+def test_concurrent_streams_do_not_block_each_other(stub_llm):
+    stub_llm(["a", "b", "c", "d"], delay=0.05)
+
+    async def consume():
+        return "".join(
+            [c async for c in llm_client.stream([{"role": "user", "content": "q"}])]
+        )
+
+    async def run(n):
+        started = time.perf_counter()
+        results = await asyncio.gather(*(consume() for _ in range(n)))
+        return results, time.perf_counter() - started
+
+    _, one = asyncio.run(run(1))
+    results, eight = asyncio.run(run(min(8, llm_client.LLM_MAX_CONCURRENCY)))
+    assert set(results) == {"abcd"}
+    assert eight < one * 2
+
+
+def test_stalled_stream_times_out(stub_llm, monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_STREAM_IDLE_SECONDS", 0.05)
+    stub_llm(["a", "b"], release=asyncio.Event())  # never released
+
+    async def run():
+        return [c async for c in llm_client.stream([{"role": "user", "content": "q"}])]
+
+    with pytest.raises(llm_client.LLMTimeoutError):
+        asyncio.run(run())
+
+
+def test_sse_sends_sql_tokens_before_generation_finishes(stub_llm, monkeypatch):
+    # main pulls in the charting stack; without it only the tests above run
+    for module in ("lida", "matplotlib", "altair", "altair_saver"):
+        pytest.importorskip(module)
+    import main
+
+    async def tables(question, datasource_id, messages=None):
+        return ["orders"]
+
+    async def validate(question, datasource_id, sql, schema_string, result=None):
+        return {"valid": False, "errors": [], "sql": sql, "dialect": None}, False
+
+    monkeypatch.setattr(main, "lookup_cached_sql", lambda *args: None)
+    monkeypatch.setattr(main, "select_relevant_tables", tables)
+    monkeypatch.setattr(main, "fetch_schema_for_tables", lambda *args: {})
+    monkeypatch.setattr(main, "generate_llm_schema", lambda schema_info: "")
+    monkeypatch.setattr(main, "validate_generated_sql", validate)
+
+    async def run():
+        release = asyncio.Event()
+        stub = stub_llm(["SELECT", " 1"], release=release)
+        body = {"question": "q", "datasource_id": "1"}
+        request = SimpleNamespace(json=lambda: asyncio.sleep(0, result=body))
+        response = await main.generate_sql_stream(request)
+        received = []
+        async for event in response.body_iterator:
+            data = json.loads(event[len("data: ") :])
+            if data["type"] == "sql" and data["chunk"]:
+                received.append((data["chunk"], stub.finished))
+                release.set()
+        return received
+
+    received = asyncio.run(asyncio.wait_for(run(), 10))
+    assert received[0] == ("SELECT", False)
+    assert "".join(chunk for chunk, _ in received) == "SELECT 1"
+
+
+def test_sql_over_datasource_is_cached_when_chat_has_results(
+    stub_llm, monkeypatch, file_datasource
+):
+    for module in ("lida", "matplotlib", "altair", "altair_saver"):
+        pytest.importorskip(module)
+    import main
+    import result_tables
+
+    async def tables(question, datasource_id, messages=None):
+        return ["orders"]
+
+    results = [
+        {
+            "table_name": "result_abc",
+            "query_id": "abc",
+            "rows": 1,
+            "columns": [{"name": "total", "type": "double"}],
+            "sql": "SELECT SUM(amount) AS total FROM orders",
+        }
+    ]
+    monkeypatch.setattr(main, "select_relevant_tables", tables)
+    monkeypatch.setattr(result_tables, "session_tables", lambda query_ids: results)
+
+    question = "largest order amount"
+    body = {"question": question, "datasource_id": file_datasource}
+    request = SimpleNamespace(json=lambda: asyncio.sleep(0, result=body))
+
+    async def run():
+        stub_llm(["SELECT MAX(amount) FROM orders"])
+        response = await main.generate_sql_stream(request)
+        return [event async for event in response.body_iterator]
+
+    asyncio.run(asyncio.wait_for(run(), 10))
+    assert main.lookup_cached_sql(question, file_datasource)["sql"]
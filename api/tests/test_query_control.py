@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import query_control
+from db_models import DataSource
+from metadata_store import session_scope
+from pydantic_models import DBConfig
+from query_control import timeout_ms_for
+
+CONNECTION = {
+    "dialect": "postgresql",
+    "host": "db.internal",
+    "port": "5432",
+    "database": "sales",
+    "username": "analyst",
+    "password": "secret",
+}
+
+
+@pytest.fixture
+def warehouse():
+    """Id of a saved database datasource with a 60s statement timeout."""
+    config = {**CONNECTION, "statement_timeout_ms": 60000}
+    with session_scope() as session:
+        ds = session.query(DataSource).filter_by(name="warehouse").first()
+        if ds is None:
+            ds = DataSource(name="warehouse", type="database", config="{}")
+            session.add(ds)
+        ds.config = json.dumps(config)
+        session.commit()
+        return ds.id
+
+
+def request(**fields) -> DBConfig:
+    return DBConfig(**{**CONNECTION, "port": 5432, **fields})
+
+
+def test_datasource_timeout_replaces_the_default(warehouse, monkeypatch):
+    monkeypatch.setattr(query_control, "STATEMENT_TIMEOUT_MS", 300000)
+    assert timeout_ms_for(request(datasource_id=warehouse)) == 60000
+    assert timeout_ms_for(request()) == 300000
+
+
+def test_request_can_only_shorten_the_timeout(warehouse):
+    assert timeout_ms_for(request(datasource_id=warehouse, statement_timeout_ms=5)) == 5
+    for value in (0, -1, 10**9):
+        config = request(datasource_id=warehouse, statement_timeout_ms=value)
+        assert timeout_ms_for(config) == 60000
+
+
+def test_datasource_settings_need_its_credentials(warehouse, monkeypatch):
+    monkeypatch.setattr(query_control, "STATEMENT_TIMEOUT_MS", 300000)
+    config = request(datasource_id=warehouse, password="guess")
+    assert timeout_ms_for(config) == 300000
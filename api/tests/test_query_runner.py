@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from query_runner import ParquetChunkWriter, rows_to_batch
+
+
+def write_chunks(path, chunks, row_group_size=2) -> pa.Table:
+    writer = ParquetChunkWriter(str(path), row_group_size=row_group_size)
+    for rows in chunks:
+        writer.write(rows_to_batch(rows, ["value"]))
+    writer.close()
+    return pq.read_table(str(path))
+
+
+def test_decimals_keep_their_digits(tmp_path):
+    table = write_chunks(
+        tmp_path / "r.parquet",
+        [[(Decimal("1.5"),)], [(Decimal("123456789.123"),)], [(7,)]],
+    )
+    assert pa.types.is_decimal(table.schema.field("value").type)
+    assert table.column("value").to_pylist() == [
+        Decimal("1.5"),
+        Decimal("123456789.123"),
+        Decimal("7"),
+    ]
+
+
+def test_decimals_too_wide_for_parquet_are_text(tmp_path):
+    wide = Decimal("1" * 30 + "." + "1" * 10)
+    table = write_chunks(tmp_path / "r.parquet", [[(Decimal("1.5"),)], [(wide,)]])
+    assert table.column("value").to_pylist() == ["1.5", str(wide)]
+
+
+def test_all_null_first_chunk_takes_the_later_type(tmp_path):
+    table = write_chunks(tmp_path / "r.parquet", [[(None,)], [(1,), (2,)], [(3,)]])
+    assert table.schema.field("value").type == pa.int64()
+    assert table.column("value").to_pylist() == [None, 1, 2, 3]
+
+
+def test_type_change_after_a_row_group_rewrites_the_file(tmp_path):
+    path = tmp_path / "r.parquet"
+    table = write_chunks(path, [[(1,), (2,)], [(2.5,)], [("n/a",)]])
+    assert table.column("value").to_pylist() == ["1", "2", "2.5", "n/a"]
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,92 @@
+import json
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import result_cache
+from db_models import DataSource, ResultCache
+from metadata_store import session_scope
+from pydantic_models import DBConfig
+from result_store import result_store
+
+CONNECTION = {
+    "dialect": "postgresql",
+    "host": "db.internal",
+    "port": "5432",
+    "database": "sales",
+    "username": "analyst",
+    "password": "secret",
+}
+
+
+@pytest.fixture
+def crm():
+    """Id of a saved database datasource whose results are cached for 120s."""
+    config = {**CONNECTION, "result_cache_ttl": 120}
+    with session_scope() as session:
+        ds = session.query(DataSource).filter_by(name="crm").first()
+        if ds is None:
+            ds = DataSource(name="crm", type="database", config="{}")
+            session.add(ds)
+        ds.config = json.dumps(config)
+        session.commit()
+        return ds.id
+
+
+def request(**fields) -> DBConfig:
+    return DBConfig(**{**CONNECTION, "port": 5432, "sql": "SELECT 1", **fields})
+
+
+def stored_result(query_id: str) -> str:
+    pq.write_table(pa.table({"n": [1]}), result_store.staging_path(query_id))
+    result_store.commit(query_id)
+    return query_id
+
+
+def test_ttl_comes_from_the_saved_datasource(crm):
+    assert result_cache.ttl_seconds(request(datasource_id=crm)) == 120
+    assert (
+        result_cache.ttl_seconds(request(datasource_id=crm, result_cache_ttl=30)) == 30
+    )
+    assert (
+        result_cache.ttl_seconds(request(datasource_id=crm, result_cache_ttl=86400))
+        == 120
+    )
+
+
+def test_ad_hoc_and_spoofed_requests_are_not_cached(crm):
+    spoofed = request(datasource_id=crm, password="guess", result_cache_ttl=600)
+    assert result_cache.datasource_key(spoofed).startswith("url:")
+    assert result_cache.ttl_seconds(spoofed) == 0
+    assert result_cache.ttl_seconds(request()) == 0
+
+    result_cache.store(request(datasource_id=crm), stored_result("crm1"), 1, 5)
+    assert result_cache.lookup(request(datasource_id=crm))["query_id"] == "crm1"
+    assert result_cache.lookup(spoofed) is None
+
+
+def test_a_shorter_request_ttl_misses_without_dropping_the_entry(crm):
+    cfg = request(datasource_id=crm, sql="SELECT 2")
+    result_cache.store(cfg, stored_result("crm2"), 1, 5)
+    with session_scope() as session:
+        entry = session.query(ResultCache).filter_by(query_id="crm2").one()
+        entry.created_at = datetime.now() - timedelta(seconds=60)
+        session.commit()
+
+    shorter = request(datasource_id=crm, sql="SELECT 2", result_cache_ttl=30)
+    assert result_cache.lookup(shorter) is None
+    assert result_cache.lookup(cfg)["query_id"] == "crm2"
+
+
+def test_file_datasource_results_are_cached(file_datasource):
+    cfg = DBConfig(
+        dialect="duckdb",
+        database="shop",
+        datasource_id=file_datasource,
+        sql="SELECT amount FROM orders",
+    )
+    assert result_cache.datasource_key(cfg) == f"ds:{file_datasource}"
+    result_cache.store(cfg, stored_result("shop1"), 3, 5)
+    assert result_cache.lookup(cfg)["query_id"] == "shop1"
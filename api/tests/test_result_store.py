@@ -0,0 +1,95 @@
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from result_store import ResultStore, ResultNotFound
+
+
+def store_result(store: ResultStore, query_id: str, rows: int = 10) -> dict:
+    table = pa.table(
+        {"n": list(range(rows)), "label": [f"row {i}" for i in range(rows)]}
+    )
+    pq.write_table(table, store.staging_path(query_id))
+    return store.commit(query_id)
+
+
+def test_commit_publishes_result_with_metadata(tmp_path):
+    store = ResultStore(root=str(tmp_path))
+    staging = store.staging_path("q1")
+    with pytest.raises(ResultNotFound):
+        store.get("q1")  # not visible while it is being written
+
+    entry = store_result(store, "q1", rows=3)
+    assert not os.path.exists(staging)
+    assert entry["rows"] == 3
+    assert [c["name"] for c in entry["columns"]] == ["n", "label"]
+    assert pq.read_table(store.get("q1")).num_rows == 3
+
+
+def test_rejects_ids_that_could_escape_the_root(tmp_path):
+    store = ResultStore(root=str(tmp_path))
+    for query_id in ("../q1", "a/b", "", "x" * 65):
+        with pytest.raises(ValueError):
+            store.staging_path(query_id)
+
+
+def test_expired_results_are_gone(tmp_path):
+    store = ResultStore(root=str(tmp_path), ttl_seconds=60)
+    store_result(store, "old")
+    store._entries["old"]["created_at"] = time.time() - 61
+
+    with pytest.raises(ResultNotFound):
+        store.get("old")
+    assert not os.path.exists(os.path.join(str(tmp_path), "old.parquet"))
+    assert store.stats()["expirations"] == 1
+
+
+def test_quota_evicts_least_recently_read_first(tmp_path):
+    store = ResultStore(root=str(tmp_path))
+    size = store_result(store, "a")["bytes"]
+    store_result(store, "b")
+    store.max_bytes = int(size * 2.5)
+
+    store._entries["a"]["last_access"] = time.time() - 10
+    store.get("a")  # a is now the most recently read
+    store_result(store, "c")
+
+    assert set(store.query_ids()) == {"a", "c"}
+    assert store.stats()["evictions"] == 1
+
+
+def test_new_result_is_kept_even_over_quota(tmp_path):
+    store = ResultStore(root=str(tmp_path), max_bytes=1)
+    store_result(store, "big", rows=1000)
+    assert store.query_ids() == ["big"]
+
+
+def test_index_is_rebuilt_from_files_on_disk(tmp_path):
+    store_result(ResultStore(root=str(tmp_path)), "q1", rows=4)
+    os.remove(os.path.join(str(tmp_path), "index.json"))
+
+    reopened = ResultStore(root=str(tmp_path))
+    assert reopened.entry("q1")["rows"] == 4
+
+
+def test_cleanup_removes_stale_staging_files(tmp_path):
+    store = ResultStore(root=str(tmp_path), ttl_seconds=60)
+    staging = store.staging_path("abandoned")
+    with open(staging, "w") as f:
+        f.write("partial")
+    os.utime(staging, (time.time() - 120, time.time() - 120))
+
+    assert store.cleanup()["stale_staging_files"] == 1
+    assert not os.path.exists(staging)
+
+
+def test_results_committed_by_another_worker_are_found(tmp_path):
+    reader = ResultStore(root=str(tmp_path))
+    reader.query_ids()  # index loaded before the other worker commits
+    store_result(ResultStore(root=str(tmp_path)), "q1", rows=2)
+
+    assert reader.entry("q1")["rows"] == 2
+    assert "q1" in reader.query_ids()
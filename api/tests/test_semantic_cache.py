@@ -0,0 +1,100 @@
+import pytest
+
+import sql_cache
+import result_tables
+from semantic_cache import SemanticCache, same_meaning
+from utils import fetch_schema_for_tables, generate_llm_schema
+
+
+@pytest.mark.parametrize(
+    "question, cached_question",
+    [
+        ("revenue by region in 2023", "revenue by region in 2024"),
+        ("sales excluding returns", "sales including returns"),
+        ("top 5 customers by revenue", "top 50 customers by revenue"),
+        (
+            "customers who did not order last month",
+            "customers who did order last month",
+        ),
+        ("revenue for 'north' region", "revenue for 'south' region"),
+        ("orders per customer", "customers per order"),
+        (
+            "orders shipped to customers from Canada",
+            "orders shipped from customers to Canada",
+        ),
+        ("average order value by month", "average order value by month and region"),
+        ("top selling products last month", "bottom selling products last month"),
+    ],
+)
+def test_rejects_questions_that_need_different_sql(question, cached_question):
+    assert not same_meaning(question, cached_question)
+
+
+@pytest.mark.parametrize(
+    "question, cached_question",
+    [
+        ("top selling products last month", "best sellers previous month"),
+        ("How many orders were placed in 2024?", "how many orders were placed in 2024"),
+        ("average revenue by client", "mean earnings by customer"),
+    ],
+)
+def test_accepts_paraphrases(question, cached_question):
+    assert same_meaning(question, cached_question)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    schema = {"orders": ["order_id", "amount"]}
+    monkeypatch.setattr(
+        sql_cache,
+        "current_schema",
+        lambda tables, datasource_id, expected_hash: (
+            schema if expected_hash == sql_cache.schema_hash("v1") else None
+        ),
+    )
+    return SemanticCache()
+
+
+def test_paraphrase_reuses_cached_sql(cache):
+    cache.add(
+        "top selling products last month", "ds1", ["orders"], "v1", "SELECT 1", 900
+    )
+
+    hit = cache.lookup("best sellers previous month", "ds1")
+    assert hit["sql"] == "SELECT 1"
+    assert hit["matched_question"] == "top selling products last month"
+    assert cache.lookup("best sellers previous month", "other datasource") is None
+    assert cache.lookup("top selling products in 2023", "ds1") is None
+
+
+def test_re_adding_a_question_replaces_its_entry(cache):
+    cache.add("orders by region", "ds1", ["orders"], "v1", "SELECT 1", 10)
+    cache.add("orders by region", "ds1", ["orders"], "v1", "SELECT 2", 10)
+
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup("orders by region", "ds1")["sql"] == "SELECT 2"
+
+
+def test_entries_for_a_changed_schema_are_dropped(cache):
+    cache.add("orders by region", "ds1", ["orders"], "v0", "SELECT 1", 10)
+
+    assert cache.lookup("orders by region", "ds1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_sql_cached_from_the_datasource_schema_hits(file_datasource):
+    schema = generate_llm_schema(fetch_schema_for_tables(["orders"], file_datasource))
+    results = [
+        {
+            "table_name": "result_abc",
+            "rows": 1,
+            "columns": [{"name": "total", "type": "double"}],
+        }
+    ]
+    with_results = schema + "\n\n" + result_tables.describe(results)
+
+    sql_cache.store("order total", file_datasource, ["orders"], with_results, "X", 5)
+    assert sql_cache.lookup("order total", file_datasource) is None
+
+    sql_cache.store("order total", file_datasource, ["orders"], schema, "X", 5)
+    assert sql_cache.lookup("order total", file_datasource)["sql"] == "X"
@@ -0,0 +1,51 @@
+import pytest
+
+import sql_guard
+from sql_guard import GuardError, enforce_read_only, row_cap
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "DELETE FROM orders",
+        "UPDATE orders SET amount = 0",
+        "DROP TABLE orders",
+        "SELECT 1; DELETE FROM orders",
+        "WITH gone AS (DELETE FROM orders RETURNING *) SELECT * FROM gone",
+        "SELECT * INTO copy FROM orders",
+    ],
+)
+def test_refuses_anything_but_one_read_only_query(sql):
+    with pytest.raises(GuardError):
+        enforce_read_only(sql, "postgres", 100)
+
+
+def test_adds_missing_limit():
+    sql, applied = enforce_read_only("SELECT * FROM orders", "postgres", 100)
+    assert applied == 100
+    assert sql.endswith("LIMIT 100")
+
+
+def test_lowers_larger_limit_and_keeps_smaller_one():
+    sql, applied = enforce_read_only("SELECT * FROM orders LIMIT 5000", "postgres", 100)
+    assert (applied, sql.endswith("LIMIT 100")) == (100, True)
+
+    original = "SELECT * FROM orders LIMIT 10"
+    assert enforce_read_only(original, "postgres", 100) == (original, None)
+
+
+def test_replaces_non_literal_limit():
+    sql, applied = enforce_read_only(
+        "SELECT * FROM orders LIMIT (SELECT 10 ^ 9)", "postgres", 100
+    )
+    assert applied == 100
+    assert sql.endswith("LIMIT 100")
+
+
+def test_request_can_only_lower_row_cap(monkeypatch):
+    monkeypatch.setattr(sql_guard, "GUARD_MAX_ROWS", 1000)
+    assert row_cap(None) == 1000
+    assert row_cap(10) == 10
+    assert row_cap(0) == 1000
+    assert row_cap(-1) == 1000
+    assert row_cap(10**9) == 1000
@@ -0,0 +1,73 @@
+from sql_validator import validate_sql
+
+
+def error_types(result):
+    return [error["type"] for error in result["errors"]]
+
+
+def test_valid_sql_is_transpiled_to_the_datasource_dialect(file_datasource):
+    result = validate_sql(
+        "SELECT c.name, SUM(o.amount) AS total FROM orders o "
+        "JOIN customers c ON c.customer_id = o.customer_id GROUP BY c.name",
+        file_datasource,
+    )
+    assert result["valid"], result["errors"]
+    assert result["dialect"] == "duckdb"
+
+
+def test_ctes_and_subquery_aliases_resolve(file_datasource):
+    result = validate_sql(
+        "WITH big AS (SELECT customer_id, amount FROM orders WHERE amount > 5) "
+        "SELECT t.customer_id FROM (SELECT customer_id FROM big) t",
+        file_datasource,
+    )
+    assert result["valid"], result["errors"]
+
+
+def test_unknown_table_and_column_suggest_close_matches(file_datasource):
+    result = validate_sql("SELECT * FROM order", file_datasource)
+    assert error_types(result) == ["unknown_table"]
+    assert result["errors"][0]["suggestion"] == "orders"
+
+    result = validate_sql("SELECT o.amout FROM orders o", file_datasource)
+    assert error_types(result) == ["unknown_column"]
+    assert result["errors"][0]["suggestion"] == "amount"
+
+
+def test_syntax_errors_and_non_queries(file_datasource):
+    assert error_types(validate_sql("SELECT FROM WHERE (", file_datasource)) == [
+        "syntax"
+    ]
+    result = validate_sql("DELETE FROM orders", file_datasource)
+    assert error_types(result) == ["not_a_query"]
+
+
+def test_markdown_fences_are_stripped(file_datasource):
+    result = validate_sql("```sql\nSELECT amount FROM orders\n```", file_datasource)
+    assert result["valid"], result["errors"]
+
+
+def test_result_tables_run_on_duckdb_and_cant_be_mixed(file_datasource):
+    results = {"result_abc": {"total"}}
+    result = validate_sql(
+        "SELECT total FROM result_abc", file_datasource, result_tables=results
+    )
+    assert result["valid"] and result["dialect"] == "duckdb"
+
+    result = validate_sql(
+        "SELECT * FROM result_abc r JOIN orders o ON true",
+        file_datasource,
+        result_tables=results,
+    )
+    assert error_types(result) == ["mixed_sources"]
+    assert result["errors"][0]["tables"] == ["orders"]
+
+
+def test_mixed_sources_error_names_table_functions(file_datasource):
+    result = validate_sql(
+        "SELECT * FROM result_abc r JOIN read_csv('/etc/passwd') p ON true",
+        file_datasource,
+        result_tables={"result_abc": {"total"}},
+    )
+    assert error_types(result) == ["mixed_sources"]
+    assert "read_csv('/etc/passwd')" in result["errors"][0]["message"].lower()
@@ -0,0 +1,16 @@
+from sqlalchemy import text
+
+from metadata_store import engine
+from utils import fetch_schema_for_tables, list_tables
+
+
+def test_app_tables_are_never_in_a_datasource_schema():
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS sales (id INTEGER, amount REAL)"))
+    datasource_id = "metadata-db"
+
+    assert list_tables(datasource_id) == ["sales"]
+    for tables in ("all", ["sales", "chat_messages", "query_logs"]):
+        schema = fetch_schema_for_tables(tables, datasource_id)
+        assert [table["table_name"] for table in schema] == ["sales"]
+    assert fetch_schema_for_tables("chat_sessions", datasource_id)["status"] == "error"
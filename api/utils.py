@@ -1,5 +1,4 @@
-from sqlalchemy import create_engine, text, inspect, bindparam
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text, bindparam
 
 import os
 import json
@@ -7,13 +6,15 @@ import openai
 
 from dotenv import load_dotenv
 from pydantic_models import *
+from engine_registry import engine_registry
+from db_models import Base
+from metadata_store import engine, SessionLocal, session_scope, get_inspector
+from schema_cache import reflection_cache
+from schema_introspection import bulk_reflect
+from file_engine import file_engines, is_file_config
 
 load_dotenv()  # Load from .env file
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
-
 
 def build_db_url(cfg: DBConfig) -> str:
     if cfg.dialect == "snowflake":
@@ -30,11 +31,21 @@ def build_db_url(cfg: DBConfig) -> str:
         return f"{cfg.dialect}://{cfg.username}:{cfg.password}@{cfg.host}:{cfg.port}/{cfg.database}"
 
 
-def fetch_table_descriptions(format="json"):
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
+def get_datasource_engine(cfg: DBConfig):
+    """
+    Shared, pooled engine for a user datasource (see engine_registry), or the
+    DuckDB FileEngine of a file datasource.
+    """
+    if is_file_config(cfg):
+        file_engine = file_engines.get(cfg.datasource_id)
+        if file_engine is None:
+            raise ValueError(f"Datasource {cfg.datasource_id} is not a file datasource")
+        return file_engine
+    return engine_registry.get(build_db_url(cfg))
 
-    with SessionLocal() as session:
+
+def fetch_table_descriptions(format="json"):
+    with session_scope() as session:
         result = session.execute(
             text("SELECT table_name, table_description FROM table_metadata")
         )
@@ -119,26 +130,69 @@ def generate_llm_schema(schema: list) -> str:
     return "\n".join(lines).strip()
 
 
-def fetch_schema_for_tables(table_list, datasource_id):
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(bind=engine)
-    session = SessionLocal()
-    inspector = inspect(engine)
-
-    protected_tables = {
-        "query_logs",
-        "table_metadata",
-        "column_metadata",
-        "data_sources",
-    }
+# The app's own tables (in the metadata database) are never part of a
+# datasource's schema
+PROTECTED_TABLES = set(Base.metadata.tables)
+
+
+def list_tables(datasource_id) -> list[str]:
+    file_engine = file_engines.get(datasource_id)
+    if file_engine is not None:
+        return file_engine.table_names()
+    table_names = reflection_cache.get_table_names(datasource_id)
+    if table_names is None:
+        table_names = get_inspector().get_table_names()
+        reflection_cache.put_table_names(datasource_id, table_names)
+    return [t for t in table_names if t not in PROTECTED_TABLES]
+
+
+def reflect_tables(table_list, datasource_id) -> dict:
+    """
+    Reflected structure for each table, served from the reflection cache where
+    possible. Cache misses are reflected together in one bulk catalog pass.
+    Tables that fail to reflect map to the error message instead.
+    """
+    reflected = {}
+    missing = []
 
+    for table_name in table_list:
+        info = reflection_cache.get(datasource_id, table_name)
+        if info is None:
+            missing.append(table_name)
+        else:
+            reflected[table_name] = info
+
+    if missing:
+        file_engine = file_engines.get(datasource_id)
+        try:
+            if file_engine is not None:
+                fresh = file_engine.reflect(missing)
+            else:
+                fresh = bulk_reflect(engine, missing)
+        except Exception as e:
+            fresh = {}
+            print(f"Schema reflection failed: {e}")
+
+        for table_name in missing:
+            info = fresh.get(table_name)
+            if info is None:
+                reflected[table_name] = f"Table '{table_name}' not found"
+                continue
+            reflection_cache.put(datasource_id, table_name, info)
+            reflected[table_name] = info
+
+    return reflected
+
+
+def fetch_schema_for_tables(table_list, datasource_id):
     # Step 1: Get list of relevant tables
     if table_list == "all":
-        table_list = [
-            t for t in inspector.get_table_names() if t not in protected_tables
-        ]
+        table_list = list_tables(datasource_id)
     elif isinstance(table_list, str):
         table_list = [table_list]
+    if file_engines.get(datasource_id) is None:
+        # Also for tables named by the LLM picker or the client
+        table_list = [t for t in table_list if t not in PROTECTED_TABLES]
 
     # Step 2: Fetch column descriptions
     query = text(
@@ -150,7 +204,8 @@ def fetch_schema_for_tables(table_list, datasource_id):
     ).bindparams(bindparam("tables", expanding=True))
 
     params = {"tables": table_list, "datasource_id": datasource_id}
-    meta_rows = session.execute(query, params).fetchall()
+    with session_scope() as session:
+        meta_rows = session.execute(query, params).fetchall()
 
     # Step 3: Build lookup map for descriptions
     column_meta = {
@@ -159,47 +214,37 @@ def fetch_schema_for_tables(table_list, datasource_id):
 
     schema = []
 
-    # Step 4: Build full schema
+    # Step 4: Build full schema from the (cached) reflection
+    reflected = reflect_tables(table_list, datasource_id)
     for table_name in table_list:
-        try:
-            columns = inspector.get_columns(table_name)
-            pk_columns = set(
-                inspector.get_pk_constraint(table_name).get("constrained_columns", [])
-            )
-            foreign_keys = {
-                fk["constrained_columns"][0]: {
-                    "referred_table": fk["referred_table"],
-                    "referred_column": fk["referred_columns"][0],
-                }
-                for fk in inspector.get_foreign_keys(table_name)
-                if fk.get("constrained_columns") and fk.get("referred_columns")
+        info = reflected[table_name]
+        if isinstance(info, str):
+            schema.append({"table_name": table_name, "error": info, "columns": []})
+            continue
+
+        pk_columns = set(info["primary_key"])
+        foreign_keys = info["foreign_keys"]
+
+        column_list = []
+        for col in info["columns"]:
+            col_name = col["name"]
+            column_info = {
+                "name": col_name,
+                "description": column_meta.get(
+                    (table_name, col_name), "No description"
+                ),
+                "type": col["type"],
+                "is_primary_key": col_name in pk_columns,
+                "is_foreign_key": col_name in foreign_keys,
             }
+            if col_name in foreign_keys:
+                fk = foreign_keys[col_name]
+                column_info["references"] = (
+                    f"{fk['referred_table']}({fk['referred_column']})"
+                )
+            column_list.append(column_info)
 
-            column_list = []
-            for col in columns:
-                col_name = col["name"]
-                column_info = {
-                    "name": col_name,
-                    "description": column_meta.get(
-                        (table_name, col_name), "No description"
-                    ),
-                    "type": str(col["type"]),
-                    "is_primary_key": col_name in pk_columns,
-                    "is_foreign_key": col_name in foreign_keys,
-                }
-                if col_name in foreign_keys:
-                    fk = foreign_keys[col_name]
-                    column_info["references"] = (
-                        f"{fk['referred_table']}({fk['referred_column']})"
-                    )
-                column_list.append(column_info)
-
-            schema.append({"table_name": table_name, "columns": column_list})
-
-        except Exception as e:
-            schema.append({"table_name": table_name, "error": str(e), "columns": []})
-
-    session.close()
+        schema.append({"table_name": table_name, "columns": column_list})
 
     if not schema:
         return {"status": "error", "message": "No schema could be generated."}
@@ -244,8 +289,5 @@ Table Descriptions:
 
 
 def get_db():
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from dotenv import load_dotenv
+
+from lida import Manager, llm
+from db_models import VisualizationCache
+from metadata_store import session_scope
+
+load_dotenv()  # Load from .env file
+
+VIZ_CACHE_TTL_SECONDS = int(os.getenv("VIZ_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_text_gen = None
+_text_gen_lock = threading.Lock()
+
+
+def get_manager(data) -> Manager:
+    """
+    A LIDA Manager whose generated chart code runs against `data`. The text
+    generator (and its OpenAI client) is created once and shared; Managers
+    are not, since each holds the dataset of the request that made it.
+    """
+    global _text_gen
+    with _text_gen_lock:
+        if _text_gen is None:
+            _text_gen = llm("openai")
+    manager = Manager(text_gen=_text_gen)
+    manager.data = data
+    return manager
+
+
+class VizCacheStats:
+    def __init__(self):
+        self.query_hits = 0
+        self.schema_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+
+stats = VizCacheStats()
+
+
+def result_fingerprint(profile: dict) -> str:
+    """
+    Hash of what LIDA's chart choice depends on: column names, the profiled
+    dtype of each (number, date, category, string, ...) and the order of
+    magnitude of the row count. Results of the same query shape on
+    different data share a fingerprint.
+    """
+    columns = [[name, column["dtype"]] for name, column in profile["columns"].items()]
+    payload = json.dumps([columns, len(str(profile["rows"]))])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _is_expired(created_at: datetime) -> bool:
+    return created_at + timedelta(seconds=VIZ_CACHE_TTL_SECONDS) <= datetime.now()
+
+
+def lookup(query_id: str, fingerprint: str):
+    """
+    The stored chart for this result, else one made for a result with the
+    same fingerprint, else None. Returns {"spec", "title", "cached"} where
+    cached is "query" or "schema".
+    """
+    with session_scope() as session:
+        for kind, key in (("query", query_id), ("schema", fingerprint)):
+            entry = session.get(VisualizationCache, f"{kind}:{key}")
+            if entry is None:
+                continue
+            if _is_expired(entry.created_at):
+                session.delete(entry)
+                session.commit()
+                continue
+            entry.hit_count = (entry.hit_count or 0) + 1
+            entry.last_hit_at = datetime.now()
+            session.commit()
+            stats.record(f"{kind}_hits")
+            return {"spec": entry.spec, "title": entry.title, "cached": kind}
+
+    stats.record("misses")
+    return None
+
+
+def store(query_id: str, fingerprint: str, spec: dict, title: str = None):
+    # Data is attached per request, so only the chart itself is kept
+    spec = {k: v for k, v in spec.items() if k not in ("data", "datasets")}
+    spec = json.loads(json.dumps(spec, default=str))
+    now = datetime.now()
+    with session_scope() as session:
+        for kind, key in (("query", query_id), ("schema", fingerprint)):
+            session.merge(
+                VisualizationCache(
+                    cache_key=f"{kind}:{key}",
+                    query_id=query_id,
+                    fingerprint=fingerprint,
+                    title=title,
+                    spec=spec,
+                    hit_count=0,
+                    created_at=now,
+                    last_hit_at=None,
+                )
+            )
+        session.commit()
+
+
+def clear(query_id: str = None) -> int:
+    with session_scope() as session:
+        query = session.query(VisualizationCache)
+        if query_id is not None:
+            query = query.filter_by(query_id=query_id)
+        removed = query.delete()
+        session.commit()
+    return removed
+
+
+def get_stats() -> dict:
+    with session_scope() as session:
+        entries, total_hits = session.query(
+            func.count(VisualizationCache.cache_key),
+            func.coalesce(func.sum(VisualizationCache.hit_count), 0),
+        ).one()
+
+    hits = stats.query_hits + stats.schema_hits
+    lookups = hits + stats.misses
+    return {
+        "entries": entries,
+        "ttl_seconds": VIZ_CACHE_TTL_SECONDS,
+        # Since this process started
+        "query_hits": stats.query_hits,
+        "schema_hits": stats.schema_hits,
+        "misses": stats.misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        # Over the lifetime of the stored entries
+        "total_hits": int(total_hits),
+    }
@@ -16,6 +16,11 @@ export default function QueryResultTable({
 }) {
   return (
     <div className="mt-6 space-y-2">
+      {(queryResult.summary || queryResult.summary_status === "pending") && (
+        <p className="text-sm text-slate-700">
+          &nbsp;&nbsp;&nbsp;{queryResult.summary ?? "Summarizing results..."}
+        </p>
+      )}
       <div className="text-sm text-slate-500">
         &nbsp;&nbsp;&nbsp;Showing {queryResult.rows} rows
       </div>
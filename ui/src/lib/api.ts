@@ -1,10 +1,15 @@
 // lib/api.ts
 
-export const runQuery = async (dbConfig: any, sql: string, user_query: string) => {
+export const runQuery = async (
+    dbConfig: any,
+    sql: string,
+    user_query: string,
+    confirmed = false // run even if the cost check asks for confirmation
+) => {
     const res = await fetch("http://localhost:8000/execute_sql", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ ...dbConfig, sql, user_query }),
+        body: JSON.stringify({ ...dbConfig, sql, user_query, confirmed }),
     });
 
     const data = await res.json();
@@ -12,6 +17,25 @@ export const runQuery = async (dbConfig: any, sql: string, user_query: string) =
     return data;
 };
 
+export const fetchQuerySummary = async (queryId: string) => {
+    const res = await fetch(
+        `http://localhost:8000/query_summary?query_id=${queryId}`
+    );
+    if (!res.ok) throw new Error("Summary not found");
+    return res.json();
+};
+
+// Summaries are generated in the background; resolves once one is ready
+// (or failed), or with null after `attempts` seconds
+export const pollQuerySummary = async (queryId: string, attempts = 60) => {
+    for (let attempt = 0; attempt < attempts; attempt++) {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const result = await fetchQuerySummary(queryId).catch(() => null);
+        if (result && result.summary_status !== "pending") return result;
+    }
+    return null;
+};
+
 // export const generateSqlStream = async (
 //     question: string,
 //     sourceId: number,
@@ -52,7 +76,9 @@ export const generateSqlStream = async (
     sourceId: number,
     onStep: (e: any) => void,
     onSql: (chunk: string) => void,
-    context: any[] // new param
+    context: any[], // new param
+    onSqlFinal?: (sql: string) => void, // validated SQL in the datasource's dialect
+    resultIds: string[] = [] // earlier results in the chat, queryable as result_<id>
 ) => {
     const res = await fetch("http://localhost:8000/generate_sql_stream", {
         method: "POST",
@@ -61,6 +87,7 @@ export const generateSqlStream = async (
             question,
             datasource_id: sourceId,
             context,
+            result_ids: resultIds,
         }),
     });
 
@@ -82,6 +109,7 @@ export const generateSqlStream = async (
 
             if (json.type === "step") onStep(json);
             else if (json.type === "sql") onSql(json.chunk);
+            else if (json.type === "sql_final") onSqlFinal?.(json.sql);
         }
     }
 };
@@ -6,7 +6,7 @@ import { MessageSquare } from "lucide-react";
 
 import { useChatState } from "../hooks/useChatState";
 import { useDataSource } from "../hooks/useDataSource";
-import { runQuery, generateSqlStream } from "../lib/api";
+import { runQuery, generateSqlStream, pollQuerySummary } from "../lib/api";
 
 import SuggestedQueries from "@/components/SuggestedQueries";
 import PromptBar from "@/components/PromptBar";
@@ -80,6 +80,7 @@ export default function ChatPage({
 
         // Initialize message states for restored messages
         const initialStates: Record<number, any> = {};
+        const pendingSummaries: [number, any][] = [];
         fetchedMessages.forEach((msg: any, idx: number) => {
           if (msg.type === "query_result") {
             initialStates[idx] = {
@@ -106,12 +107,16 @@ export default function ChatPage({
                   initialStates[i].queryResult = msg.content.data;
                   initialStates[i].showData = true;
                 }
+                if (msg.content.data?.summary_status === "pending") {
+                  pendingSummaries.push([i, msg]);
+                }
                 break;
               }
             }
           }
         });
         setMessageStates(initialStates);
+        pendingSummaries.forEach(([i, msg]) => fillSummary(i, msg));
       } catch (error) {
         console.error("Failed to fetch chat messages:", error);
         setIsNewChat(true);
@@ -215,6 +220,38 @@ export default function ChatPage({
         },
       ]); // add current question
 
+    // Results already fetched in this chat; follow-ups can query them locally
+    const resultIds = messages
+      .map((_, idx) => messageStates[idx]?.queryResult?.query_id)
+      .filter((id): id is string => Boolean(id));
+
+    const showSql = (sql: string) => {
+      setSqlOutput(sql);
+
+      setMessages((prev) => {
+        const updated = [...prev];
+        const lastIdx = updated.length - 1;
+
+        updated[lastIdx] = {
+          ...updated[lastIdx],
+          content: {
+            ...updated[lastIdx].content,
+            sql,
+          },
+        };
+
+        setMessageStates((prevStates) => ({
+          ...prevStates,
+          [lastIdx]: {
+            ...prevStates[lastIdx],
+            editableSql: sql,
+          },
+        }));
+
+        return updated;
+      });
+    };
+
     try {
       await generateSqlStream(
         question,
@@ -238,32 +275,15 @@ export default function ChatPage({
         },
         (chunk) => {
           fullSql += chunk;
-          setSqlOutput(fullSql);
-
-          setMessages((prev) => {
-            const updated = [...prev];
-            const lastIdx = updated.length - 1;
-
-            updated[lastIdx] = {
-              ...updated[lastIdx],
-              content: {
-                ...updated[lastIdx].content,
-                sql: fullSql,
-              },
-            };
-
-            setMessageStates((prevStates) => ({
-              ...prevStates,
-              [lastIdx]: {
-                ...prevStates[lastIdx],
-                editableSql: fullSql,
-              },
-            }));
-
-            return updated;
-          });
+          showSql(fullSql);
         },
-        context // Pass full context here
+        context, // Pass full context here
+        (sql) => {
+          // Validated and transpiled SQL replaces what was streamed
+          fullSql = sql;
+          showSql(fullSql);
+        },
+        resultIds
       );
 
       const finalMessage = {
@@ -306,11 +326,16 @@ export default function ChatPage({
       }));
 
       try {
-        const data = await runQuery(
+        let data = await runQuery(
           dbConfig,
           currentState.editableSql,
           question
         );
+        if (data.status === "confirm_required") {
+          data = window.confirm(data.message)
+            ? await runQuery(dbConfig, currentState.editableSql, question, true)
+            : { status: "error", message: "Query not run." };
+        }
 
         if (data.status === "success") {
           setMessageStates((prev) => ({
@@ -330,6 +355,9 @@ export default function ChatPage({
           };
           setMessages((prev) => [...prev, resultMessage]);
           saveMessage("assistant", "data_preview", resultMessage.content);
+          if (data.summary_status === "pending" && data.query_id) {
+            fillSummary(messageIndex, resultMessage);
+          }
         } else {
           setMessageStates((prev) => ({
             ...prev,
@@ -359,6 +387,32 @@ export default function ChatPage({
     };
   };
 
+  // Summaries are generated after the rows come back; the server keeps them
+  // per query, so restored chats fetch theirs the same way
+  const fillSummary = async (messageIndex: number, resultMessage: any) => {
+    const data = resultMessage.content.data;
+    const result = await pollQuerySummary(data.query_id);
+    const summarized = {
+      ...data,
+      summary: result?.summary,
+      summary_status: result?.summary_status ?? "error",
+    };
+
+    setMessageStates((prev) =>
+      prev[messageIndex]?.queryResult?.query_id === data.query_id
+        ? {
+            ...prev,
+            [messageIndex]: { ...prev[messageIndex], queryResult: summarized },
+          }
+        : prev
+    );
+    setMessages((prev) =>
+      prev.map((msg) =>
+        msg === resultMessage ? { ...msg, content: { data: summarized } } : msg
+      )
+    );
+  };
+
   const updateEditableSql = (messageIndex: number, newSql: string) => {
     setMessageStates((prev) => ({
       ...prev,
@@ -21,7 +21,7 @@ import {
 } from "lucide-react";
 import { useChatState } from "../hooks/useChatState";
 import { useDataSource } from "../hooks/useDataSource";
-import { runQuery, generateSqlStream } from "../lib/api";
+import { runQuery, generateSqlStream, pollQuerySummary } from "../lib/api";
 
 import StepTimeline from "@/components/StepTimeline";
 import QueryControls from "@/components/QueryControls";
@@ -76,7 +76,9 @@ export default function PromptStudio() {
       question,
       selectedSourceId!,
       (step) => setSteps((prev) => [...prev, step]),
-      (chunk) => setSqlOutput((prev) => prev + chunk)
+      (chunk) => setSqlOutput((prev) => prev + chunk),
+      [],
+      (sql) => setSqlOutput(sql)
     );
 
     setLoading(false);
@@ -89,9 +91,18 @@ export default function PromptStudio() {
     setQueryResult(null);
 
     try {
-      const data = await runQuery(dbConfig, editableSql, question);
-      if (data.status === "success") setQueryResult(data);
-      else setQueryError(data);
+      let data = await runQuery(dbConfig, editableSql, question);
+      if (data.status === "confirm_required") {
+        data = window.confirm(data.message)
+          ? await runQuery(dbConfig, editableSql, question, true)
+          : { status: "error", message: "Query not run." };
+      }
+      if (data.status === "success") {
+        setQueryResult(data);
+        if (data.summary_status === "pending" && data.query_id) {
+          pollSummary(data.query_id);
+        }
+      } else setQueryError(data);
     } catch (e: any) {
       setQueryError(e.message);
     } finally {
@@ -99,6 +110,19 @@ export default function PromptStudio() {
     }
   };
 
+  const pollSummary = async (queryId: string) => {
+    const result = await pollQuerySummary(queryId);
+    setQueryResult((prev: any) =>
+      prev && prev.query_id === queryId
+        ? {
+            ...prev,
+            summary: result?.summary,
+            summary_status: result?.summary_status ?? "error",
+          }
+        : prev
+    );
+  };
+
   return (
     <div className="relative h-screen flex flex-col bg-white">
       {/* Header */}
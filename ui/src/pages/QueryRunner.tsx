@@ -20,15 +20,17 @@ import {
   Activity,
   Lightbulb,
 } from "lucide-react";
+import { pollQuerySummary } from "@/lib/api";
 
 type ApiResponse = {
-  status: "success" | "error";
+  status: "success" | "error" | "confirm_required";
   query_id?: string;
   rows?: number;
   data?: (string | number)[][];
   columns?: string[];
   message?: string;
-  summary?: string;
+  summary?: string | null;
+  summary_status?: "pending" | "success" | "error";
 };
 
 type SQLGenResponse = {
@@ -130,7 +132,7 @@ export default function QueryRunner() {
     await fetchDbConfig(numId);
   };
 
-  const runQuery = async () => {
+  const runQuery = async (confirmed = false) => {
     if (!dbConfig) return;
 
     const cleanedSql = sql.replace(/\n/g, " ").trim();
@@ -141,10 +143,19 @@ export default function QueryRunner() {
       const res = await fetch("http://localhost:8000/execute_sql", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ ...dbConfig, sql: cleanedSql }),
+        body: JSON.stringify({ ...dbConfig, sql: cleanedSql, confirmed }),
       });
       const result: ApiResponse = await res.json();
+      if (result.status === "confirm_required") {
+        setLoading(false);
+        if (window.confirm(result.message)) return runQuery(true);
+        setResponse({ status: "error", message: "Query not run." });
+        return;
+      }
       setResponse(result);
+      if (result.summary_status === "pending" && result.query_id) {
+        pollSummary(result.query_id);
+      }
     } catch (err) {
       console.error("Query failed", err);
       setResponse({ status: "error", message: "Failed to send request" });
@@ -153,6 +164,21 @@ export default function QueryRunner() {
     }
   };
 
+  const pollSummary = async (queryId: string) => {
+    const result = await pollQuerySummary(queryId);
+    if (!result) return;
+
+    setResponse((prev) =>
+      prev && prev.query_id === queryId
+        ? {
+            ...prev,
+            summary: result.summary,
+            summary_status: result.summary_status,
+          }
+        : prev
+    );
+  };
+
   const generateSQL = async () => {
     if (!selectedSourceId) return;
 
@@ -373,7 +399,7 @@ export default function QueryRunner() {
                 <h3 className="font-semibold text-slate-900">SQL Editor</h3>
               </div>
               <Button
-                onClick={runQuery}
+                onClick={() => runQuery()}
                 disabled={loading || !sql.trim() || !dbConfig}
                 className="bg-green-600 hover:bg-green-700 text-white px-6"
               >
@@ -479,7 +505,9 @@ export default function QueryRunner() {
                   <div className="p-4 border-b border-slate-200 bg-slate-50">
                     <p className="text-sm text-slate-700 font-medium">
                       {response.summary ??
-                        "This is a summary of the results returned by your query."}
+                        (response.summary_status === "pending"
+                          ? "Summarizing results..."
+                          : "This is a summary of the results returned by your query.")}
                     </p>
                   </div>
                   <div className="overflow-auto h-full">